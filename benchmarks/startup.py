@@ -0,0 +1,69 @@
+"""
+Startup time budget of the headless calendar generator.
+
+Spawns ``python -m multicalendar_libs.headless`` the way batch jobs do and
+compares the median wall time against the budget, after subtracting the bare
+interpreter startup. It also checks that no heavy module is imported. Run it
+from the repository root:
+
+    python benchmarks/startup.py [--runs 20] [--budget-ms 100]
+
+Exits with status 1 when the budget is exceeded.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median extra milliseconds over "python -c pass" for rendering one year
+STARTUP_BUDGET_MS = 100
+FORBIDDEN_MODULES = ("inkex", "lxml", "numpy")
+
+HEADLESS = ["-m", "multicalendar_libs.headless", "--year=2024", "--output=" + os.devnull]
+CHECK_IMPORTS = [
+    "-c",
+    "import sys; from multicalendar_libs import headless; headless.main({0!r}); "
+    "print(' '.join(m for m in {1!r} if m in sys.modules))".format(HEADLESS[2:], FORBIDDEN_MODULES),
+]
+
+
+def median_ms(args, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    pars = argparse.ArgumentParser(description="Check the headless startup budget.")
+    pars.add_argument("--runs", type=int, default=20)
+    pars.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    options = pars.parse_args()
+
+    imported = subprocess.run([sys.executable] + CHECK_IMPORTS, cwd=ROOT, check=True,
+                              stdout=subprocess.PIPE, universal_newlines=True).stdout.split()
+    interpreter = median_ms(["-c", "pass"], options.runs)
+    headless = median_ms(HEADLESS, options.runs)
+    extra = headless - interpreter
+    print("interpreter: {0:.1f} ms".format(interpreter))
+    print("headless:    {0:.1f} ms (+{1:.1f} ms, budget {2:.0f} ms)".format(
+        headless, extra, options.budget_ms))
+    failed = False
+    if imported:
+        print("FAIL: heavy modules imported: " + ", ".join(imported))
+        failed = True
+    if extra > options.budget_ms:
+        print("FAIL: startup budget exceeded")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
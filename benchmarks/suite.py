@@ -0,0 +1,246 @@
+"""
+Benchmark suite of the calendar generator.
+
+Measures the date conversions (including every calendar engine to every
+other one), the month grids, the rendering of one month and whole documents
+of 1, 12 and 120 months with and without secondary dates and week numbers.
+Every case records its median wall time, its peak traced memory and, when it
+produces SVG, the number of elements and the output size. Run it from the
+repository root:
+
+    python benchmarks/suite.py --save      # record benchmarks/baseline.json
+    python benchmarks/suite.py             # compare against the baseline
+
+Documents are rendered by the headless generator; --inkex renders them with
+the Inkscape extension (Calendar.effect) instead, which needs inkex. Only the
+Python allocations are traced, not those of lxml.
+
+A case is flagged when it is slower or takes more memory than the baseline by
+more than the tolerance, or when its element count or output size changed.
+The exit status is 1 when any case is flagged.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from multicalendar_libs import convert, engines, layout, monthgrid  # noqa: E402
+from multicalendar_libs.headless import HeadlessCalendar  # noqa: E402
+
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+# Relative slowdown or memory growth over the baseline that is flagged
+TOLERANCE = 0.25
+
+DOCUMENTS = [
+    ("1-month", ["--year=2024", "--month=3"]),
+    ("12-months", ["--year=2024"]),
+    ("120-months", ["--range-start=2020-01-01", "--range-end=2029-12-31"]),
+]
+VARIANTS = [
+    ("", []),
+    ("+secondary", ["--enable-secondary-date=true"]),
+    ("+weeknr", ["--show-week-number=true"]),
+    ("+secondary+weeknr", ["--enable-secondary-date=true", "--show-week-number=true"]),
+]
+BLANK_SVG = ('<svg xmlns="http://www.w3.org/2000/svg" width="210mm" height="297mm" '
+             'viewBox="0 0 210 297"></svg>')
+
+
+def convert_gregorian():
+    """Gregorian.to_hijri for every day of 2000 to 2009"""
+    dates = [convert.jdn_to_gregorian(jdn) for jdn in
+             range(convert.gregorian_to_jdn(2000, 1, 1), convert.gregorian_to_jdn(2010, 1, 1))]
+
+    def run():
+        for y, m, d in dates:
+            convert.Gregorian(y, m, d, 0).to_hijri()
+    return run
+
+
+def convert_hijri():
+    """Hijri.to_gregorian for every day of 1420 to 1429"""
+    dates = [(y, m, d) for y in range(1420, 1430) for m in range(1, 13) for d in range(1, 30)]
+
+    def run():
+        for y, m, d in dates:
+            convert.Hijri(y, m, d, 0).to_gregorian()
+    return run
+
+
+def convert_engines():
+    """Every day of 2000 to 2009 from each calendar engine to each other one"""
+    jdns = range(convert.gregorian_to_jdn(2000, 1, 1), convert.gregorian_to_jdn(2010, 1, 1))
+    calendars = [engines.engine(name) for name in sorted(engines.ENGINES)]
+    dates = [(source, source.from_jdn_bulk(jdns)) for source in calendars]
+
+    def run():
+        for source, source_dates in dates:
+            converted = source.to_jdn_bulk(source_dates)
+            for target in calendars:
+                target.from_jdn_bulk(converted)
+    return run
+
+
+def month_grids():
+    """monthgrid.month_grids for the 120 Hijri months of 1420 to 1429"""
+    hijri, gregorian = engines.engine("hijri"), engines.engine("gregorian")
+
+    def run():
+        for grid in monthgrid.month_grids(hijri, gregorian, (1420, 1), 120, 0):
+            grid.secondary_spans()
+    return run
+
+
+def create_month():
+    """CalendarRenderer.create_month for the 12 months of a year"""
+    calendar = HeadlessCalendar()
+    calendar.parse_arguments(["--year=2024", "--enable-secondary-date=true",
+                              "--show-week-number=true"])
+    calendar.calculate_size_and_positions()
+    model = layout.build_year(calendar.options, calendar.months_per_line)
+
+    def run():
+        calendar.year_g = calendar.elements.Group()
+        for month in model.months:
+            calendar.create_month(month, model.day_names)
+        return calendar.year_g, None
+    return run
+
+
+def headless_document(args):
+    def run():
+        calendar = HeadlessCalendar()
+        calendar.parse_arguments(args)
+        calendar.generate(calendar.document.getroot())
+        out = io.StringIO()
+        calendar.document.write(out)
+        return calendar.document.getroot(), len(out.getvalue().encode("utf-8"))
+    return run
+
+
+def inkex_document(args, blank):
+    import multicalendar
+
+    def run():
+        calendar = multicalendar.Calendar()
+        out = io.BytesIO()
+        calendar.run(args + [blank], output=out)
+        return calendar.document.getroot(), len(out.getvalue())
+    return run
+
+
+def cases(options, blank):
+    yield "convert/gregorian-to-hijri", convert_gregorian
+    yield "convert/hijri-to-gregorian", convert_hijri
+    yield "convert/engines-any-to-any", convert_engines
+    yield "monthgrid/month-grids", month_grids
+    yield "render/create-month", create_month
+    for name, args in DOCUMENTS:
+        for suffix, extra in VARIANTS:
+            if options.inkex:
+                yield "document/" + name + suffix, lambda a=args + extra: inkex_document(a, blank)
+            else:
+                yield "document/" + name + suffix, lambda a=args + extra: headless_document(a)
+
+
+def measure(setup, runs):
+    """Median seconds, peak KiB, element count and output bytes of a case"""
+    run = setup()
+    result = run() or (None, None)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    # a separate run, tracing slows everything down
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    root, size = result
+    return {
+        "seconds": timings[len(timings) // 2],
+        "peak_kib": peak / 1024.0,
+        "elements": None if root is None else sum(1 for _ in root.iter()),
+        "bytes": size,
+    }
+
+
+def compare(name, current, baseline, tolerance):
+    """The reasons for flagging a case against its baseline"""
+    if baseline is None:
+        return []
+    flags = []
+    if current["seconds"] > baseline["seconds"] * (1 + tolerance):
+        flags.append("time x{0:.2f}".format(current["seconds"] / baseline["seconds"]))
+    if current["peak_kib"] > baseline["peak_kib"] * (1 + tolerance):
+        flags.append("memory x{0:.2f}".format(current["peak_kib"] / baseline["peak_kib"]))
+    for key in ("elements", "bytes"):
+        if current[key] != baseline[key]:
+            flags.append("{0} {1} -> {2}".format(key, baseline[key], current[key]))
+    return flags
+
+
+def main():
+    pars = argparse.ArgumentParser(description="Run the calendar benchmark suite.")
+    pars.add_argument("--runs", type=int, default=5, help="Timed runs per case.")
+    pars.add_argument("--filter", default="", help="Only run the cases containing this text.")
+    pars.add_argument("--baseline", default=BASELINE, help="Baseline file.")
+    pars.add_argument("--save", action="store_true", help="Save the results as the baseline.")
+    pars.add_argument("--tolerance", type=float, default=TOLERANCE)
+    pars.add_argument("--inkex", action="store_true",
+                      help="Render the documents with the Inkscape extension.")
+    options = pars.parse_args()
+
+    baseline = {}
+    if not options.save and os.path.exists(options.baseline):
+        with open(options.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get("inkex", False) != options.inkex:
+            print("The baseline was not recorded with the same renderer, ignoring it.")
+            baseline = {}
+
+    with tempfile.NamedTemporaryFile("w", suffix=".svg", delete=False) as blank:
+        blank.write(BLANK_SVG)
+    results = {}
+    flagged = 0
+    try:
+        print("{0:40} {1:>10} {2:>10} {3:>9} {4:>10}".format(
+            "case", "ms", "peak KiB", "elements", "bytes"))
+        for name, setup in cases(options, blank.name):
+            if options.filter not in name:
+                continue
+            results[name] = current = measure(setup, options.runs)
+            flags = compare(name, current, baseline.get("cases", {}).get(name), options.tolerance)
+            flagged += bool(flags)
+            print("{0:40} {1:10.2f} {2:10.1f} {3:>9} {4:>10}{5}".format(
+                name, current["seconds"] * 1000, current["peak_kib"],
+                "-" if current["elements"] is None else current["elements"],
+                "-" if current["bytes"] is None else current["bytes"],
+                "  FLAGGED: " + ", ".join(flags) if flags else ""))
+    finally:
+        os.unlink(blank.name)
+
+    if options.save:
+        with open(options.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "inkex": options.inkex, "runs": options.runs, "cases": results},
+                      baseline_file, indent=2, sort_keys=True)
+        print("Baseline saved to " + options.baseline)
+    elif not baseline:
+        print("No baseline to compare with, record one with --save.")
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
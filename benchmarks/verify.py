@@ -0,0 +1,328 @@
+"""
+Differential verification of the fast date conversion paths.
+
+Every optimized conversion must give the results of the original datetime
+and float (Kuwaiti algorithm) conversions of multicalendar_libs.convert,
+including their adjust shift and the month 13 clamp of Julian.to_hijri. The
+reference is a copy of that original code, so it shares nothing with the paths
+it checks; with --hijri-table, the Hijri dates of the reference are read from
+the table file by a plain expansion of its months. This sweeps every day of a
+Gregorian range, by default the whole supported range of years 1 to 9999,
+through the reference and through each optimized path:
+
+    scalar  the per-date functions (jdn_to_hijri, hijri_to_jdn, ...)
+    list    the bulk functions on lists
+    numpy   the bulk functions on NumPy arrays, when NumPy is installed
+    engine  the bulk methods of the calendar engines
+
+The days are converted CHUNK at a time, so the sweep runs in constant memory.
+It reports the throughput of every path, its speedup over the reference and
+its mismatches, consecutive mismatching days collapsed into one run shown by
+its first date. Run it from the repository root:
+
+    python benchmarks/verify.py
+    python benchmarks/verify.py --start=1900-01-01 --end=2100-12-31 --adjust=-1,0,1
+    python benchmarks/verify.py --hijri-table=hijri.bin --checks=jdn-to-hijri
+
+The exit status is 1 when any path disagrees with the reference.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import struct
+import sys
+import time
+from math import floor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from multicalendar_libs import arguments, convert, engines  # noqa: E402
+
+# Days converted at once
+CHUNK = 100000
+# Mismatching runs listed per path
+LIMIT = 20
+
+
+# The days of the --hijri-table file, a ReferenceTable, or None for the
+# tabular Hijri calendar
+reference_table = None
+
+
+class ReferenceTable(object):
+    """The Hijri dates of every day of a month table file, read with struct"""
+
+    def __init__(self, path):
+        with open(path, "rb") as table_file:
+            data = table_file.read()
+        header = "<4sHiI"
+        _, _, first_year, years = struct.unpack_from(header, data)
+        starts = struct.unpack_from("<{0}i".format(years * 12 + 1), data,
+                                    struct.calcsize(header))
+        self.dates = {}
+        self.jdns = {}
+        for index in range(years * 12):
+            y, m = first_year + index // 12, index % 12 + 1
+            for jdn in range(starts[index], starts[index + 1]):
+                d = jdn - starts[index] + 1
+                self.dates[jdn] = [y, m, d]
+                self.jdns[(y, m, d)] = jdn
+
+    def to_hijri(self, jdn):
+        if jdn not in self.dates:
+            raise ValueError("JDN {0} is outside the Hijri month table.".format(jdn))
+        return self.dates[jdn]
+
+    def to_jdn(self, y, m, d):
+        if (y, m, d) not in self.jdns:
+            raise ValueError("{0}-{1}-{2} is outside the Hijri month table.".format(y, m, d))
+        return self.jdns[(y, m, d)]
+
+
+# The original conversions of the Gregorian, Julian and Hijri classes. The day
+# their Gregorian conversions subtract with a timedelta is taken off the
+# ordinal instead, so the first and last days of the range stay in datetime's.
+
+def reference_gregorian_to_jd(y, m, d, adjust):
+    """Gregorian(y, m, d, adjust).to_julian()"""
+    return datetime.date(y, m, d).toordinal() - (adjust + 1) + 1721425
+
+
+def reference_jd_to_gregorian(jd):
+    """Julian(jd).to_gregorian()"""
+    gdate = datetime.date.fromordinal(jd - 1721425 - 1)
+    return [gdate.year, gdate.month, gdate.day]
+
+
+def reference_jd_to_hijri(jd):
+    """Julian(jd).to_hijri()"""
+    if reference_table is not None:
+        return reference_table.to_hijri(jd + 1)
+    iyear = 10631.0/30.0
+    epochastro = 1948084
+    shift1 = 8.01/60.0
+
+    z = jd - epochastro
+    cyc = floor(z / 10631.0)
+    z -= 10631 * cyc
+    j = floor((z - shift1) / iyear)
+    iy = 30 * cyc + j
+    z -= floor(j * iyear + shift1)
+    im = floor((z + 28.5001) / 29.5)
+    if im == 13:
+        im = 12
+    id = z - floor(29.5001 * im - 29)
+    return [iy, im, id]
+
+
+def reference_hijri_to_jd(y, m, d, adjust):
+    """Hijri(y, m, d, adjust).to_julian()"""
+    if reference_table is not None:
+        return reference_table.to_jdn(y, m, d) + adjust + 1
+    return floor((11 * y + 3) / 30) + floor(354 * y) + floor(30 * m) - floor((m - 1) / 2) + \
+        (d + adjust + 2) + 1948440 - 386
+
+
+def jdn_inputs(jdns, adjust):
+    return list(jdns)
+
+
+def gregorian_inputs(jdns, adjust):
+    return [tuple(reference_jd_to_gregorian(jdn + 1)) for jdn in jdns]
+
+
+def hijri_inputs(jdns, adjust):
+    return [tuple(reference_jd_to_hijri(jdn - adjust - 1)) for jdn in jdns]
+
+
+# name: (inputs of the JDNs swept, reference, scalar path, bulk path, engine path)
+CHECKS = {
+    "jdn-to-gregorian": (
+        jdn_inputs,
+        lambda jdn, adjust: reference_jd_to_gregorian(jdn + 1),
+        lambda jdn, adjust: convert.jdn_to_gregorian(jdn),
+        lambda jdns, adjust, use_numpy: convert.jdn_to_gregorian_bulk(jdns, use_numpy),
+        lambda jdns, adjust: engines.engine("gregorian").from_jdn_bulk(jdns)),
+    "gregorian-to-jdn": (
+        gregorian_inputs,
+        lambda date, adjust: reference_gregorian_to_jd(date[0], date[1], date[2], 0) + 1,
+        lambda date, adjust: convert.gregorian_to_jdn(*date),
+        lambda dates, adjust, use_numpy: convert.gregorian_to_jdn_bulk(dates, use_numpy),
+        lambda dates, adjust: engines.engine("gregorian").to_jdn_bulk(dates)),
+    "jdn-to-hijri": (
+        jdn_inputs,
+        lambda jdn, adjust: reference_jd_to_hijri(jdn - adjust - 1),
+        convert.jdn_to_hijri,
+        convert.jdn_to_hijri_bulk,
+        lambda jdns, adjust: engines.engine("hijri", adjust).from_jdn_bulk(jdns)),
+    "hijri-to-jdn": (
+        hijri_inputs,
+        lambda date, adjust: reference_hijri_to_jd(date[0], date[1], date[2], adjust) - 1,
+        lambda date, adjust: convert.hijri_to_jdn(date[0], date[1], date[2], adjust),
+        convert.hijri_to_jdn_bulk,
+        lambda dates, adjust: engines.engine("hijri", adjust).to_jdn_bulk(dates)),
+    "gregorian-to-hijri": (
+        gregorian_inputs,
+        lambda date, adjust: reference_jd_to_hijri(
+            reference_gregorian_to_jd(date[0], date[1], date[2], adjust)),
+        lambda date, adjust: convert.jdn_to_hijri(convert.gregorian_to_jdn(*date), adjust),
+        convert.gregorian_to_hijri_bulk,
+        None),
+    "hijri-to-gregorian": (
+        hijri_inputs,
+        lambda date, adjust: reference_jd_to_gregorian(
+            reference_hijri_to_jd(date[0], date[1], date[2], adjust)),
+        lambda date, adjust: convert.jdn_to_gregorian(
+            convert.hijri_to_jdn(date[0], date[1], date[2], adjust)),
+        convert.hijri_to_gregorian_bulk,
+        None),
+}
+
+
+def paths(check):
+    """The (name, function of (inputs, adjust)) of the optimized paths of a check"""
+    _, _, scalar, bulk_path, engine_path = CHECKS[check]
+    yield "scalar", lambda inputs, adjust: [scalar(value, adjust) for value in inputs]
+    yield "list", lambda inputs, adjust: bulk_path(inputs, adjust, use_numpy=False)
+    if convert.load_numpy():
+        yield "numpy", lambda inputs, adjust: bulk_path(inputs, adjust, use_numpy=True)
+    if engine_path is not None:
+        yield "engine", engine_path
+
+
+def normalized(results):
+    """The results of any path as a list of ints or of (y, m, d) tuples"""
+    if not isinstance(results, list):
+        results = results.tolist()
+    return [tuple(value) if isinstance(value, (list, tuple)) else value
+            for value in results]
+
+
+class PathResult(object):
+    """Time, number of dates and mismatching runs of one path of a check"""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.dates = 0
+        self.mismatches = 0
+        # [first jdn, last jdn, input, expected, got] of consecutive mismatches
+        self.runs = []
+
+    def add(self, jdn, value, expected, got):
+        self.mismatches += 1
+        if self.runs and self.runs[-1][1] == jdn - 1:
+            self.runs[-1][1] = jdn
+        else:
+            self.runs.append([jdn, jdn, value, expected, got])
+
+    def rate(self):
+        return self.dates / self.seconds if self.seconds else 0.0
+
+
+def timed(result, func, *args):
+    begin = time.perf_counter()
+    value = func(*args)
+    result.seconds += time.perf_counter() - begin
+    return value
+
+
+def verify(check, start, end, adjust, chunk=CHUNK):
+    """The PathResult of the reference and of every optimized path of a check"""
+    inputs_of, reference = CHECKS[check][:2]
+    reference_result = PathResult("reference")
+    results = [(PathResult(name), func) for name, func in paths(check)]
+    for low in range(start, end + 1, chunk):
+        jdns = range(low, min(low + chunk, end + 1))
+        inputs = inputs_of(jdns, adjust)
+        expected = normalized(timed(reference_result, lambda: [reference(value, adjust)
+                                                               for value in inputs]))
+        reference_result.dates += len(inputs)
+        for result, func in results:
+            got = normalized(timed(result, func, inputs, adjust))
+            result.dates += len(inputs)
+            if got != expected:
+                for jdn, value, want, have in zip(jdns, inputs, expected, got):
+                    if want != have:
+                        result.add(jdn, value, want, have)
+    return [reference_result] + [result for result, _ in results]
+
+
+def report(check, adjust, results, limit=LIMIT, out=sys.stdout):
+    reference = results[0]
+    out.write("{0} (adjust {1})\n".format(check, adjust))
+    for result in results:
+        speedup = result.rate() / reference.rate() if reference.rate() else 0.0
+        out.write("  {0:<10} {1:>12,.0f} dates/s {2:>7.1f}x  {3} mismatches\n".format(
+            result.name, result.rate(), speedup,
+            "-" if result is reference else result.mismatches))
+        for first, last, value, expected, got in result.runs[:limit]:
+            days = "JDN {0}".format(first) if first == last else \
+                "JDN {0}-{1} ({2} days)".format(first, last, last - first + 1)
+            out.write("      {0}: {1} gives {2}, expected {3}\n".format(
+                days, value, got, expected))
+        if len(result.runs) > limit:
+            out.write("      ... {0} more runs\n".format(len(result.runs) - limit))
+
+
+def as_json(check, adjust, results):
+    return {"check": check, "adjust": adjust, "paths": [
+        {"name": result.name, "dates": result.dates, "seconds": result.seconds,
+         "dates_per_second": result.rate(), "mismatches": result.mismatches,
+         "runs": [{"first": run[0], "last": run[1], "input": run[2],
+                   "expected": run[3], "got": run[4]} for run in result.runs]}
+        for result in results]}
+
+
+def main(args=None):
+    pars = argparse.ArgumentParser(
+        description="Compare the fast conversion paths with the reference classes.")
+    pars.add_argument("--start", default="1-01-01", help="First Gregorian date, YYYY-MM-DD.")
+    pars.add_argument("--end", default="9999-12-31", help="Last Gregorian date, YYYY-MM-DD.")
+    pars.add_argument("--adjust", default="0",
+                      help="Comma separated Hijri adjustments to verify.")
+    pars.add_argument("--checks", default=",".join(CHECKS),
+                      help="Comma separated checks among " + ", ".join(CHECKS) + ".")
+    pars.add_argument("--hijri-table", dest="hijri_table", default="",
+                      help="Verify with this Hijri month start table installed.")
+    pars.add_argument("--limit", type=int, default=LIMIT,
+                      help="Mismatching runs listed per path.")
+    pars.add_argument("--json", default=None, help="Also write the results to this file.")
+    options = pars.parse_args(args)
+
+    try:
+        start = convert.gregorian_to_jdn(*arguments.parse_date(options.start))
+        end = convert.gregorian_to_jdn(*arguments.parse_date(options.end))
+        adjusts = [int(value) for value in options.adjust.split(",")]
+    except ValueError:
+        pars.error("The dates must be given as YYYY-MM-DD and the adjustments as integers.")
+    checks = [name.strip() for name in options.checks.split(",") if name.strip()]
+    for name in checks:
+        if name not in CHECKS:
+            pars.error('Unknown check "{0}".'.format(name))
+    if options.hijri_table:
+        global reference_table
+        from multicalendar_libs import hijritable
+        hijritable.install(options.hijri_table)
+        reference_table = ReferenceTable(options.hijri_table)
+
+    sys.stdout.write("{0:,} days, JDN {1} to {2}\n".format(end - start + 1, start, end))
+    failed = False
+    records = []
+    for adjust in adjusts:
+        for check in checks:
+            results = verify(check, start, end, adjust)
+            report(check, adjust, results, options.limit)
+            records.append(as_json(check, adjust, results))
+            failed = failed or any(result.mismatches for result in results)
+    if options.json:
+        with open(options.json, "w") as out:
+            json.dump(records, out, indent=1)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+Command line options of the calendar generator.
+
+These are shared by the Inkscape extension, which passes inkex.Boolean and
+inkex.Color as argument types, and the headless command line tool, which uses
+the lightweight parsers below so it never has to import inkex.
+"""
+
+import calendar
+import datetime
+import os
+import re
+
+
+def boolean(value):
+    """Parse an Inkscape style boolean ("true" or "false")"""
+    value = value.lower()
+    if value == 'true':
+        return True
+    elif value == 'false':
+        return False
+    return None
+
+
+def color(value):
+    """Parse a color into a "#rrggbb" string
+
+    Accepts "#rgb", "#rrggbb", the RGBA integers Inkscape passes for color
+    parameters, or any other CSS color name, which is kept as is.
+    """
+    value = str(value).strip()
+    if value.isdigit():
+        return '#{:06x}'.format(int(value) >> 8)
+    if re.match(r'^#[0-9a-fA-F]{3}$', value):
+        value = '#' + ''.join(char * 2 for char in value[1:])
+    return value.lower()
+
+
+def parse_date(value):
+    """Parse "YYYY-MM-DD" into a (year, month, day) tuple"""
+    m = re.match(r'^\s*(\d{1,4})-(\d{1,2})-(\d{1,2})\s*$', value)
+    if m is None:
+        raise ValueError(value)
+    return tuple(int(part) for part in m.groups())
+
+
+def cache_directory(name):
+    """The directory name of the multicalendar user cache"""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "multicalendar", name)
+
+
+def add_arguments(pars, boolean=boolean, color=color):
+    """Add the calendar options to an argparse parser"""
+    pars.add_argument("--tab", type=str, dest="tab")
+    pars.add_argument("--month", type=int, default=0,\
+        help="Month to be generated. If 0, then the entry year will be generated.")
+    pars.add_argument("--year", type=int, default=0,\
+        help="Year to be generated. If 0, then the current year will be generated.")
+    pars.add_argument("--fill-empty-day-boxes", type=boolean,\
+        dest="fill_edb", default=True, help="Fill empty day boxes with next month days.")
+    pars.add_argument("--show-week-number", type=boolean,\
+        dest="show_weeknr", default=False, help="Include a week number column.")
+    pars.add_argument("--week-numbering", dest="week_numbering", default="auto",
+        help='Week numbers: "iso" (ISO 8601), "us" (week 1 holds January 1st), "hijri" '
+             '(week 1 holds 1 Muharram) or "auto" (hijri for a Hijri primary calendar, '
+             'else us when weeks start on Sunday and iso on Monday).')
+    pars.add_argument("--start-day", default="sun", help='Week start day. ("sun" or "mon")')
+    pars.add_argument("--weekend", default="auto",\
+        help='Define the weekend days, joined by "+" ("sat+sun", "fri+sat", "sun"...). '
+             '"auto" is the weekend of the locale, else "sat+sun".')
+    pars.add_argument(
+        "--auto-organize", type=boolean, dest="auto_organize", default=True,
+        help='Automatically set the size and positions.')
+    pars.add_argument(
+        "--months-per-line", type=int, dest="months_per_line", default=3,
+        help='Number of months side by side.')
+    pars.add_argument(
+        "--month-width", type=str, dest="month_width", default="6cm",
+        help='The width of the month days box.')
+    pars.add_argument(
+        "--month-margin", type=str, dest="month_margin", default="1cm",
+        help='The space between the month boxes.')
+    pars.add_argument(
+        "--color-year", type=color, dest="color_year", default="#888",
+        help='Color for the year header.')
+    pars.add_argument(
+        "--color-month", type=color, dest="color_month", default="#666",
+        help='Color for the month name header.')
+    pars.add_argument(
+        "--color-day-name", type=color, dest="color_day_name", default="#999",
+        help='Color for the week day names header.')
+    pars.add_argument(
+        "--color-day", type=color, dest="color_day", default="#000",
+        help='Color for the common day box.')
+    pars.add_argument(
+        "--color-weekend", type=color, dest="color_weekend", default="#777",
+        help='Color for the weekend days.')
+    pars.add_argument(
+        "--color-nmd", type=color, dest="color_nmd", default="#BBB",
+        help='Color for the next month day, in empty day boxes.')
+    pars.add_argument(
+        "--color-event", type=color, dest="color_event", default="#d40000",
+        help='Color for the days with events (see --events).')
+    pars.add_argument(
+        "--color-weeknr", type=color, dest="color_weeknr", default="#808080",
+        help='Color for the week numbers.')
+    pars.add_argument(
+        "--font-year", type=str, dest="font_year", default="sans-serif",
+        help='Font for the year string.')
+    pars.add_argument(
+        "--font-month", type=str, dest="font_month", default="sans-serif",
+        help='Font for the month strings.')
+    pars.add_argument(
+        "--font-day-name", type=str, dest="font_day_name", default="sans-serif",
+        help='Font for the days of the week strings.')
+    pars.add_argument(
+        "--font-day", type=str, dest="font_day", default="sans-serif",
+        help='Font for the day strings.')
+    pars.add_argument(
+        "--locale", type=str, dest="locale", default="",
+        help='Locale pack (a name such as "id", "ar" or "fa", or the path of a pack '
+             'file) giving the names below, the digits and the weekend.')
+    pars.add_argument(
+        "--digits", type=str, dest="digits", default="auto",
+        help='Digits used instead of the Latin ones (see --use-farsi-day): '
+             '"arabic-indic", "persian", "devanagari", "thai", "bengali", "latin", '
+             'the 10 digits themselves, or "auto" for those of the locale, else arabic-indic.')
+    pars.add_argument(
+        "--month-names", type=str, dest="month_names",
+        default='January February March '
+                'April May June July '
+                'August September October '
+                'November December',
+        help='The month names for localization.')
+    pars.add_argument(
+        "--day-names", type=str, dest="day_names", default='Sun Mon Tue Wed Thu Fri Sat',
+        help='The week day names for localization.')
+    pars.add_argument(
+        "--weeknr-name", type=str, dest="weeknr_name", default='Wk',
+        help='The week number column name for localization.')
+    pars.add_argument(
+        "--encoding", type=str, dest="input_encode", default='utf-8',
+        help='The input encoding of the names.')
+    pars.add_argument(
+        "--enable-secondary-date", type=boolean, dest="enable_secondary_date", default=False,
+        help='Show Secondary Date')
+    pars.add_argument(
+        "--adjust-hijri-date", type=int, dest="adjust_hijri_date", default=0,
+        help="Adjust the day if it is too fast or too late some days.")
+    pars.add_argument(
+        "--use-farsi-day", type=str, dest="use_farsi_day", default='primer',
+        help='Use Farsi numbering symbol instead of arabic number (primer|second|both)')
+    pars.add_argument(
+        "--color-day-hijri", type=color, dest="color_day_hijri", default="#04dd04",
+        help='Color for the common day in Hijri.')
+    pars.add_argument(
+        "--color-weekend-hijri", type=color, dest="color_weekend_hijri", default="#04dd04",
+        help='Color for the weekend day in Hijri.')
+    pars.add_argument(
+        "--hijri-month-names", type=str, dest="hijri_month_names",
+        default="Muharram, Shafar, Rabi'ul Awal, "
+                "Rabi'ul-Akhir, Jumadil Awal, Jumadil Akhir, "
+                "Rajab, Sya'ban, Ramadan, "
+                "Syawal, Dzulqaidah, Dzulhijah",
+        help='The Hijri month names for localization.')
+    pars.add_argument("--primary-calendar", dest="primary_calendar", default="gregorian",\
+        help='Define primary calendar to show. ("gregorian", "hijri", "solar-hijri", '
+             '"hebrew" or "javanese")')
+    pars.add_argument("--secondary-calendar", dest="secondary_calendar", default="auto",
+        help='Calendar of the secondary dates, any of the primary calendars, or "auto" '
+             'for hijri with a Gregorian primary calendar, else gregorian.')
+    pars.add_argument(
+        "--hijri-table", type=str, dest="hijri_table", default="",
+        help='Hijri month start table file replacing the tabular month starts '
+             '(see multicalendar_libs.hijritable).')
+    pars.add_argument(
+        "--hijri-method", type=str, dest="hijri_method", default="tabular",
+        help='"tabular" Hijri month starts, or "astronomical" ones computed from the new '
+             'moons as seen from --hijri-location with --hijri-criterion.')
+    pars.add_argument(
+        "--hijri-location", type=str, dest="hijri_location", default="21.4225,39.8262",
+        help='"LATITUDE,LONGITUDE" (east positive) the astronomical Hijri month starts are '
+             'seen from, Mecca by default.')
+    pars.add_argument(
+        "--hijri-criterion", type=str, dest="hijri_criterion", default="mabims",
+        help='Crescent visibility criterion of the astronomical Hijri month starts: '
+             '"conjunction", "wujudul-hilal", "mabims" or "ALTITUDE,ELONGATION" in degrees.')
+    pars.add_argument(
+        "--events", type=str, dest="events", default="",
+        help='Comma separated .ics or .csv files of events and holidays to mark on the '
+             'days (see multicalendar_libs.events).')
+    pars.add_argument(
+        "--range-start", type=str, dest="range_start", default="",
+        help='Render every month from this date (YYYY-MM-DD) instead of one year.')
+    pars.add_argument(
+        "--range-end", type=str, dest="range_end", default="",
+        help='Last date (YYYY-MM-DD) of the range to render.')
+    pars.add_argument(
+        "--range-calendar", type=str, dest="range_calendar", default="primary",
+        help='Calendar of the range dates ("primary" or any of the primary calendars).')
+    pars.add_argument(
+        "--style-mode", dest="style_mode", default="inline",
+        help='Write the styles "inline" on every text or as "class" references '
+             'to one shared stylesheet.')
+    pars.add_argument(
+        "--use-symbols", type=boolean, dest="use_symbols", default=False,
+        help='Define the week day names header once as a symbol and place it '
+             'in every month with <use>.')
+    pars.add_argument(
+        "--workers", type=int, dest="workers", default=1,
+        help='Render the months on this many worker processes (0 for one per CPU).')
+    pars.add_argument(
+        "--fragment-cache", type=boolean, dest="fragment_cache", default=False,
+        help='Reuse the months rendered by previous runs from an on-disk cache.')
+    pars.add_argument(
+        "--fragment-cache-dir", type=str, dest="fragment_cache_dir", default="",
+        help='Directory of the fragment cache (default: the user cache directory).')
+    pars.add_argument(
+        "--fragment-cache-size", type=int, dest="fragment_cache_size", default=64,
+        help='Size limit of the fragment cache in MiB.')
+    pars.add_argument(
+        "--instrument", type=str, dest="instrument", default="",
+        help='Write the time and counters of every phase as JSON to this file '
+             '("-" for the standard error).')
+    pars.add_argument(
+        "--profile", type=str, dest="profile", default="",
+        help='Run under cProfile and dump its stats to this file.')
+
+
+def parse_names(options, errormsg):
+    """Split the names options into lists, falling back to English"""
+    # Convert string names lists in real lists
+    m = re.match(r'\s*(.*[^\s])\s*', options.month_names)
+    options.month_names = re.split(r'\s+', m.group(1))
+    m = re.match(r'\s*(.*[^\s])\s*', options.day_names)
+    options.day_names = re.split(r'\s+', m.group(1))
+    # Convert Hijri string month names
+    mh = re.match(r'\s*(.*[^,])\s*', options.hijri_month_names)
+    options.hijri_month_names = re.split(r',', mh.group(0))
+    # Validate names lists
+    if len(options.month_names) != 12:
+        errormsg('The month name list "' +
+                 str(options.month_names) +
+                 '" is invalid. Using default.')
+        options.month_names = ['January', 'February', 'March',
+                               'April', 'May', 'June',
+                               'July', 'August', 'September',
+                               'October', 'November', 'December']
+        options.hijri_month_names = ["Muharram", "Shafar", "Rabi'ul-Awal",
+                                     "Rabi'ul-Akhir", "Jumadil-Awal", "Jumadil-Akhir",
+                                     "Rajab", "Sya'ban", "Ramadan",
+                                     "Syawal", "Dzulqaidah", "Dzulhijah"]
+
+    if len(options.day_names) != 7:
+        errormsg('The day name list "' +
+                 str(options.day_names) +
+                 '" is invalid. Using default.')
+        options.day_names = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu',
+                             'Fri', 'Sat']
+
+
+def validate_options(options, unittouu, errormsg):
+    """Normalize parsed options in place"""
+    from multicalendar_libs import localepacks
+    if options.locale:
+        # The names come parsed from the locale pack
+        localepacks.apply(options, localepacks.load(options.locale))
+    else:
+        parse_names(options, errormsg)
+    if options.digits == "auto":
+        options.digits = localepacks.DIGIT_SETS["arabic-indic"]
+    options.digits = localepacks.digit_set(options.digits)
+    if options.weekend == "auto":
+        options.weekend = "sat+sun"
+    localepacks.weekend_days(options.weekend)
+    # Parse the date range, it replaces the year and month options
+    if options.range_start or options.range_end:
+        try:
+            options.range_start = parse_date(options.range_start)
+            options.range_end = parse_date(options.range_end)
+        except ValueError:
+            raise ValueError('The range dates must be given as YYYY-MM-DD.')
+        options.year = options.range_start[0]
+        options.month = 0
+    # Load the Hijri month start table, or compute the astronomical one
+    if options.hijri_method == "astronomical":
+        if options.hijri_table:
+            raise ValueError('Use either a Hijri table or the astronomical Hijri method.')
+        from multicalendar_libs import astronomical, hijritable
+        latitude, longitude = astronomical.parse_location(options.hijri_location)
+        hijritable.install(astronomical.AstronomicalTable(latitude, longitude,
+                                                          options.hijri_criterion))
+    elif options.hijri_method != "tabular":
+        raise ValueError('Unknown Hijri method "{0}", use tabular or astronomical.'.format(
+            options.hijri_method))
+    else:
+        # a table installed by an earlier run in this process must not leak
+        from multicalendar_libs import hijritable
+        hijritable.install(options.hijri_table or None)
+    # Check the event feeds exist, they are read when the months are laid out
+    if options.events:
+        from multicalendar_libs import events
+        events.feed_stamps(options.events)
+    # Check the calendars, every date converts through their engines
+    from multicalendar_libs import convert, engines
+    if options.secondary_calendar == "auto":
+        options.secondary_calendar = "hijri" if options.primary_calendar == "gregorian" \
+            else "gregorian"
+    primary = engines.engine(options.primary_calendar, options.adjust_hijri_date)
+    engines.engine(options.secondary_calendar)
+    if options.range_calendar != "primary":
+        engines.engine(options.range_calendar)
+    # Convert year 0 to current year of the primary calendar
+    if options.year == 0:
+        today = datetime.date.today().toordinal() + convert.JDN_ORDINAL_OFFSET
+        options.year = primary.from_jdn(today)[0]
+    # Year 1 starts it's week at monday, obligatorily
+    if options.year == 1:
+        options.start_day = 'mon'
+    # Set the calendar start day
+    if options.start_day == 'sun':
+        calendar.setfirstweekday(6)
+    else:
+        calendar.setfirstweekday(0)
+    # Convert string numbers with unit to user space float numbers
+    options.month_width = unittouu(options.month_width)
+    options.month_margin = unittouu(options.month_margin)
@@ -0,0 +1,320 @@
+"""
+Astronomical Hijri month starts.
+
+A month starts the day after the first evening on which the crescent is
+considered seen: the conjunction (new moon) happened before sunset and the
+moon at sunset meets a visibility criterion for a given place. CRITERIA are:
+
+    conjunction    the conjunction before sunset is enough
+    wujudul-hilal  the moon is still above the horizon at sunset
+    mabims         the moon is at least 3 degrees high and 6.4 degrees away
+                   from the sun at sunset (the 2021 MABIMS criterion)
+
+or "ALTITUDE,ELONGATION" in degrees for any other threshold. When no
+evening of the three following the conjunction qualifies, the month starts
+on the fourth day.
+
+New moons come from the series of Meeus (Astronomical Algorithms, chapter
+49), the sun and moon at sunset from the low precision formulas of the
+Astronomical Almanac, good to a few minutes and a few tenths of a degree.
+Every formula is plain arithmetic and trigonometry, so the same code runs on
+Python floats, one lunation at a time, and on NumPy arrays of whole years of
+lunations.
+
+An AstronomicalTable is a HijriTable computing its years on demand, in
+blocks of YEAR_BLOCK years. The month starts of every year are kept on disk
+per (location, criterion) in the user cache directory, so the ephemeris work
+for a year and a place only runs once. Use it with:
+
+    hijritable.install(astronomical.AstronomicalTable(-6.175, 106.827, "mabims"))
+"""
+
+import marshal
+import math
+import os
+from array import array
+
+from multicalendar_libs import convert
+from multicalendar_libs.arguments import cache_directory
+from multicalendar_libs.hijritable import HijriTable
+
+# Bump when the computed month starts change
+CACHE_VERSION = 1
+# Years computed at once
+YEAR_BLOCK = 10
+# Meeus lunation number of Muharram 1 AH, lunation 0 being the new moon of
+# 6 January 2000
+FIRST_LUNATION = -17037
+
+# (minimum altitude, minimum elongation) of the moon at sunset, in degrees
+CRITERIA = {
+    "conjunction": (-90.0, 0.0),
+    "wujudul-hilal": (0.0, 0.0),
+    "mabims": (3.0, 6.4),
+}
+# Altitude of the sun at sunset, refraction and solar radius included
+SUNSET_ALTITUDE = -0.833
+
+
+class ScalarMath(object):
+    """The NumPy functions used below, on Python floats"""
+    sin = staticmethod(math.sin)
+    cos = staticmethod(math.cos)
+    tan = staticmethod(math.tan)
+    arcsin = staticmethod(math.asin)
+    arccos = staticmethod(math.acos)
+    arctan2 = staticmethod(math.atan2)
+    radians = staticmethod(math.radians)
+    degrees = staticmethod(math.degrees)
+    floor = staticmethod(math.floor)
+    minimum = staticmethod(min)
+    maximum = staticmethod(max)
+
+    @staticmethod
+    def where(condition, a, b):
+        return a if condition else b
+
+
+def criterion(value):
+    """The (altitude, elongation) thresholds of a CRITERIA name or "ALTITUDE,ELONGATION" """
+    if value in CRITERIA:
+        return CRITERIA[value]
+    try:
+        altitude, elongation = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError('Unknown Hijri criterion "{0}", use {1} or "ALTITUDE,ELONGATION".'.format(
+            value, ", ".join(sorted(CRITERIA))))
+    return altitude, elongation
+
+
+def parse_location(value):
+    """The (latitude, longitude) of a "LATITUDE,LONGITUDE" string, east positive"""
+    try:
+        latitude, longitude = (float(part) for part in value.split(","))
+    except ValueError:
+        raise ValueError('The Hijri location must be given as "LATITUDE,LONGITUDE".')
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('The Hijri location {0} is not on Earth.'.format(value))
+    return latitude, longitude
+
+
+def new_moon(k, xp):
+    """The JDE (terrestrial time) of the new moon of lunation k"""
+    t = k / 1236.85
+    jde = (2451550.09766 + 29.530588861 * k + 0.00015437 * t ** 2
+           - 0.000000150 * t ** 3 + 0.00000000073 * t ** 4)
+    e = 1 - 0.002516 * t - 0.0000074 * t ** 2
+    m = xp.radians(2.5534 + 29.10535670 * k - 0.0000014 * t ** 2 - 0.00000011 * t ** 3)
+    mp = xp.radians(201.5643 + 385.81693528 * k + 0.0107582 * t ** 2
+                    + 0.00001238 * t ** 3 - 0.000000058 * t ** 4)
+    f = xp.radians(160.7108 + 390.67050284 * k - 0.0016118 * t ** 2
+                   - 0.00000227 * t ** 3 + 0.000000011 * t ** 4)
+    omega = xp.radians(124.7746 - 1.56375588 * k + 0.0020672 * t ** 2 + 0.00000215 * t ** 3)
+    sin = xp.sin
+    return (jde
+            - 0.40720 * sin(mp) + 0.17241 * e * sin(m) + 0.01608 * sin(2 * mp)
+            + 0.01039 * sin(2 * f) + 0.00739 * e * sin(mp - m) - 0.00514 * e * sin(mp + m)
+            + 0.00208 * e * e * sin(2 * m) - 0.00111 * sin(mp - 2 * f)
+            - 0.00057 * sin(mp + 2 * f) + 0.00056 * e * sin(2 * mp + m)
+            - 0.00042 * sin(3 * mp) + 0.00042 * e * sin(m + 2 * f)
+            + 0.00038 * e * sin(m - 2 * f) - 0.00024 * e * sin(2 * mp - m)
+            - 0.00017 * sin(omega) - 0.00007 * sin(mp + 2 * m)
+            + 0.00004 * sin(2 * mp - 2 * f) + 0.00004 * sin(3 * m)
+            + 0.00003 * sin(mp + m - 2 * f) + 0.00003 * sin(2 * mp + 2 * f)
+            - 0.00003 * sin(mp + m + 2 * f) + 0.00003 * sin(mp - m + 2 * f)
+            - 0.00002 * sin(mp - m - 2 * f) - 0.00002 * sin(3 * mp + m)
+            + 0.00002 * sin(4 * mp))
+
+
+def delta_t(jd):
+    """TT - UT in days, from the long term parabola of Morrison and Stephenson"""
+    u = ((jd - 2451545.0) / 365.25 + 180) / 100
+    return (-20 + 32 * u * u) / 86400.0
+
+
+def sun(jd, xp):
+    """The ecliptic longitude of the sun and the obliquity, in degrees"""
+    t = (jd - 2451545.0) / 36525
+    g = xp.radians(357.528 + 35999.050 * t)
+    longitude = 280.460 + 36000.771 * t + 1.915 * xp.sin(g) + 0.020 * xp.sin(2 * g)
+    return longitude, 23.439 - 0.013 * t
+
+
+def moon(jd, xp):
+    """The ecliptic longitude, latitude and horizontal parallax of the moon, in degrees"""
+    t = (jd - 2451545.0) / 36525
+
+    def term(a, b):
+        return xp.radians(a + b * t)
+    longitude = (218.32 + 481267.881 * t
+                 + 6.29 * xp.sin(term(135.0, 477198.87)) - 1.27 * xp.sin(term(259.3, -413335.36))
+                 + 0.66 * xp.sin(term(235.7, 890534.22)) + 0.21 * xp.sin(term(269.9, 954397.74))
+                 - 0.19 * xp.sin(term(357.5, 35999.05)) - 0.11 * xp.sin(term(186.5, 966404.03)))
+    latitude = (5.13 * xp.sin(term(93.3, 483202.02)) + 0.28 * xp.sin(term(228.2, 960400.89))
+                - 0.28 * xp.sin(term(318.3, 6003.15)) - 0.17 * xp.sin(term(217.6, -407332.21)))
+    parallax = (0.9508 + 0.0518 * xp.cos(term(135.0, 477198.87))
+                + 0.0095 * xp.cos(term(259.3, -413335.36))
+                + 0.0078 * xp.cos(term(235.7, 890534.22))
+                + 0.0028 * xp.cos(term(269.9, 954397.74)))
+    return longitude, latitude, parallax
+
+
+def sunset(day, latitude, longitude, xp):
+    """The JD (universal time) of the sunset of the day with JDN day at the place"""
+    noon = day - longitude / 360.0
+    sun_longitude, obliquity = sun(noon, xp)
+    lam, eps = xp.radians(sun_longitude), xp.radians(obliquity)
+    declination = xp.arcsin(xp.sin(eps) * xp.sin(lam))
+    right_ascension = xp.degrees(xp.arctan2(xp.cos(eps) * xp.sin(lam), xp.cos(lam)))
+    t = (noon - 2451545.0) / 36525
+    # equation of time, in degrees
+    equation = (280.460 + 36000.771 * t - right_ascension + 180) % 360 - 180
+    phi = math.radians(latitude)
+    cos_hour = ((math.sin(math.radians(SUNSET_ALTITUDE)) - math.sin(phi) * xp.sin(declination))
+                / (math.cos(phi) * xp.cos(declination)))
+    # no sunset in the polar day or night, take the lowest or highest sun
+    hour = xp.degrees(xp.arccos(xp.minimum(xp.maximum(cos_hour, -1.0), 1.0)))
+    return noon - equation / 360.0 + hour / 360.0
+
+
+def crescent_seen(day, conjunction, latitude, longitude, thresholds, xp):
+    """Whether the crescent is seen at the sunset of the day with JDN day"""
+    evening = sunset(day, latitude, longitude, xp)
+    tt = evening + delta_t(evening)
+    moon_longitude, moon_latitude, parallax = moon(tt, xp)
+    sun_longitude, obliquity = sun(tt, xp)
+    lam, beta, eps = xp.radians(moon_longitude), xp.radians(moon_latitude), xp.radians(obliquity)
+    elongation = xp.degrees(xp.arccos(xp.cos(beta) * xp.cos(lam - xp.radians(sun_longitude))))
+    # ecliptic to equatorial, then to the local horizon
+    declination = xp.arcsin(xp.sin(beta) * xp.cos(eps)
+                            + xp.cos(beta) * xp.sin(eps) * xp.sin(lam))
+    right_ascension = xp.arctan2(xp.sin(lam) * xp.cos(eps) - xp.tan(beta) * xp.sin(eps),
+                                 xp.cos(lam))
+    sidereal = xp.radians(280.46061837 + 360.98564736629 * (evening - 2451545.0) + longitude)
+    phi = math.radians(latitude)
+    altitude = xp.degrees(xp.arcsin(math.sin(phi) * xp.sin(declination) + math.cos(phi)
+                                    * xp.cos(declination) * xp.cos(sidereal - right_ascension)))
+    # seen from the surface of the Earth rather than its center
+    altitude = altitude - parallax * xp.cos(xp.radians(altitude))
+    min_altitude, min_elongation = thresholds
+    return (conjunction < tt) & (altitude >= min_altitude) & (elongation >= min_elongation)
+
+
+def month_start(k, latitude, longitude, thresholds, xp):
+    """The JDN of the first day of the month following the new moon of lunation k"""
+    conjunction = new_moon(k, xp)
+    # the local day of the conjunction, in mean solar time
+    day = xp.floor(conjunction - delta_t(conjunction) + 0.5 + longitude / 360.0)
+    start = day + 3
+    for offset in (2, 1, 0):
+        seen = crescent_seen(day + offset, conjunction, latitude, longitude, thresholds, xp)
+        start = xp.where(seen, day + offset + 1, start)
+    return start
+
+
+def year_starts(years, latitude, longitude, thresholds, use_numpy=None):
+    """{year: the 12 month start JDNs} of the Hijri years"""
+    years = list(years)
+    lunations = [12 * (y - 1) + m + FIRST_LUNATION for y in years for m in range(12)]
+    if use_numpy is None:
+        use_numpy = len(lunations) >= convert.NUMPY_MIN_BATCH and bool(convert.load_numpy())
+    if use_numpy:
+        numpy = convert.load_numpy()
+        k = numpy.asarray(lunations, dtype="float64")
+        starts = month_start(k, latitude, longitude, thresholds, numpy).astype("int64").tolist()
+    else:
+        starts = [int(month_start(float(k), latitude, longitude, thresholds, ScalarMath))
+                  for k in lunations]
+    return dict((y, tuple(starts[12 * i:12 * i + 12])) for i, y in enumerate(years))
+
+
+def cache_path(parameters):
+    import hashlib
+    key = hashlib.sha256(repr(parameters).encode("utf-8")).hexdigest()[:32]
+    return os.path.join(cache_directory("hijri"), key + ".marshal")
+
+
+def read_cache(path, parameters):
+    try:
+        with open(path, "rb") as cached:
+            stored, years = marshal.load(cached)
+        if stored == parameters:
+            return years
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    return {}
+
+
+def write_cache(path, parameters, years):
+    import tempfile
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write aside and rename, so a concurrent run never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as cached:
+            marshal.dump((parameters, years), cached)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # a read-only cache only costs the computing
+
+
+class AstronomicalTable(HijriTable):
+    """Hijri month starts seen at (latitude, longitude) with a criterion, computed on demand"""
+
+    def __init__(self, latitude, longitude, criterion_name="mabims"):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.thresholds = criterion(criterion_name)
+        # what the month starts depend on, also keying the fragment cache
+        self.parameters = (CACHE_VERSION, round(latitude, 4), round(longitude, 4),
+                           self.thresholds)
+        self.path = cache_path(self.parameters)
+        self.known = None
+        HijriTable.__init__(self, None, array("i", [0]))
+
+    def cover(self, first, last):
+        """Compute the years first to last, and the whole blocks around them"""
+        if self.first_year is not None:
+            if self.first_year <= first and last < self.first_year + self.years:
+                return
+            first = min(first, self.first_year)
+            last = max(last, self.first_year + self.years - 1)
+        first = first // YEAR_BLOCK * YEAR_BLOCK
+        last = last // YEAR_BLOCK * YEAR_BLOCK + YEAR_BLOCK - 1
+        if self.known is None:
+            self.known = read_cache(self.path, self.parameters)
+        # the year after the table gives the length of its last month
+        missing = [y for y in range(first, last + 2) if y not in self.known]
+        if missing:
+            self.known.update(year_starts(missing, self.latitude, self.longitude,
+                                          self.thresholds))
+            write_cache(self.path, self.parameters, self.known)
+        starts = array("i")
+        for y in range(first, last + 1):
+            starts.extend(self.known[y])
+        starts.append(self.known[last + 1][0])
+        HijriTable.__init__(self, first, starts)
+
+    def month_start(self, y, m):
+        self.cover(y, y)
+        return HijriTable.month_start(self, y, m)
+
+    def month_length(self, y, m):
+        self.cover(y, y)
+        return HijriTable.month_length(self, y, m)
+
+    def to_jdn(self, y, m, d, adjust=0):
+        if hasattr(y, "shape") and y.size:
+            self.cover(int(y.min()), int(y.max()))
+        return HijriTable.to_jdn(self, y, m, d, adjust)
+
+    def from_jdn(self, jdn, adjust=0):
+        # the tabular year is at most a year off the astronomical one
+        if hasattr(jdn, "shape"):
+            if jdn.size:
+                self.cover(convert.tabular_jdn_to_hijri(int(jdn.min()) - adjust)[0] - 1,
+                           convert.tabular_jdn_to_hijri(int(jdn.max()) - adjust)[0] + 1)
+        else:
+            year = convert.tabular_jdn_to_hijri(jdn - adjust)[0]
+            self.cover(year - 1, year + 1)
+        return HijriTable.from_jdn(self, jdn, adjust)
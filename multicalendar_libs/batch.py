@@ -0,0 +1,160 @@
+"""
+Batch generation of many calendars with a process pool.
+
+A job file describes a matrix of jobs as JSON:
+
+    {
+        "output": "{locale}/{primary-calendar}-{year}.svg",
+        "options": {"enable-secondary-date": true, "show-week-number": true},
+        "matrix": {
+            "year": [2025, 2026, 2027],
+            "primary-calendar": ["gregorian", "hijri"],
+            "locale": [
+                "en", "ar",
+                {"name": "jv", "month-names": "Januari Februari Maret ...",
+                 "day-names": "Ahad Senen Selasa Rebo Kemis Jemuwah Setu"}
+            ]
+        }
+    }
+
+"options" are passed to every job, and one job is generated for every
+combination of the "matrix" values. A matrix value is either the value of the
+option named by its key, or an object of several options whose "name" is used
+in the output file name. A "locale" value names a locale pack (see
+multicalendar_libs.localepacks), parsed once for all the jobs. Option names
+are those of the extension, without the leading dashes. "output" is formatted
+with the matrix keys; by default all of them are joined with "-".
+
+Jobs are run on all CPU cores by the headless generator, each writing one SVG.
+Failing jobs are reported and do not stop the others:
+
+    python -m multicalendar_libs.batch jobs.json --output-dir=out --jobs=8
+"""
+
+import argparse
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr
+
+
+def option_args(options):
+    """Turn an option dictionary into headless command line arguments"""
+    args = []
+    for key, value in options.items():
+        if key == "name":
+            continue
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        args.append("--{0}={1}".format(key, value))
+    return args
+
+
+def expand_jobs(spec, output_dir="."):
+    """Expand a job file into a list of (output path, argument list)"""
+    matrix = spec.get("matrix", {})
+    keys = list(matrix)
+    template = spec.get("output") or "-".join("{" + key + "}" for key in keys) + ".svg"
+    base = spec.get("options", {})
+    jobs = []
+    for values in itertools.product(*(matrix[key] for key in keys)):
+        options = dict(base)
+        fields = {}
+        for key, value in zip(keys, values):
+            if isinstance(value, dict):
+                options.update(value)
+                fields[key] = value.get("name", key)
+            else:
+                options[key] = value
+                fields[key] = value
+        path = os.path.join(output_dir, template.format(**fields))
+        jobs.append((path, option_args(options)))
+    return jobs
+
+
+def run_job(path, args):
+    """Render one job, returning (path, seconds, error message or None)"""
+    from multicalendar_libs.headless import HeadlessCalendar
+
+    start = time.perf_counter()
+    messages = []
+    stderr = io.StringIO()
+    try:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        calendar = HeadlessCalendar()
+        calendar.errormsg = messages.append
+        with redirect_stderr(stderr):
+            status = calendar.run(args + ["--output=" + path])
+        if status != 0:
+            return path, time.perf_counter() - start, "; ".join(messages)
+    except SystemExit:
+        # argparse rejected the options and explained why on stderr
+        error = stderr.getvalue().strip().split("\n")[-1]
+        return path, time.perf_counter() - start, error
+    except Exception as err:
+        return path, time.perf_counter() - start, "{0}: {1}".format(type(err).__name__, err)
+    return path, time.perf_counter() - start, None
+
+
+def run_jobs(jobs, workers=None, report=None):
+    """Run jobs on a process pool, calling report(index, result) as they finish"""
+    results = [None] * len(jobs)
+    if workers == 1:
+        for index, job in enumerate(jobs):
+            results[index] = run_job(*job)
+            if report:
+                report(index, results[index])
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_job, *job): index for index, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as err:
+                results[index] = (jobs[index][0], 0.0, "{0}: {1}".format(type(err).__name__, err))
+            if report:
+                report(index, results[index])
+    return results
+
+
+def main(args=None):
+    pars = argparse.ArgumentParser(description="Generate many calendars from a job file.")
+    pars.add_argument("jobfile", help="JSON job matrix file.")
+    pars.add_argument("--output-dir", default=".", help="Directory of the generated files.")
+    pars.add_argument("--jobs", type=int, default=None,
+                      help="Number of worker processes (default: number of CPUs).")
+    pars.add_argument("--report", default=None, help="Write the per job timings as JSON.")
+    options = pars.parse_args(args)
+
+    with open(options.jobfile, encoding="utf-8") as jobfile:
+        jobs = expand_jobs(json.load(jobfile), options.output_dir)
+
+    def report(index, result):
+        path, seconds, error = result
+        status = "FAIL" if error else "ok"
+        sys.stdout.write("{0:4} {1:8.3f}s {2}{3}\n".format(
+            status, seconds, path, " (" + error + ")" if error else ""))
+        sys.stdout.flush()
+
+    start = time.perf_counter()
+    results = run_jobs(jobs, options.jobs, report)
+    elapsed = time.perf_counter() - start
+    failed = [result for result in results if result[2]]
+    sys.stdout.write("{0} jobs, {1} failed, {2:.3f}s wall, {3:.3f}s total job time\n".format(
+        len(results), len(failed), elapsed, sum(result[1] for result in results)))
+    if options.report:
+        with open(options.report, "w", encoding="utf-8") as out:
+            json.dump([{"output": path, "seconds": seconds, "error": error}
+                       for path, seconds, error in results], out, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Concordance tables: the date of every day of a range in several calendars.
+
+rows() generates one row per day, (jdn, date, date, ...) with a (y, m, d)
+date per calendar engine, converting CHUNK days at a time with the bulk
+engine methods, so ranges of any length are exported in constant memory.
+The writers stream the rows as:
+
+    csv     "jdn,gregorian,hijri" then "2460677,2025-01-01,1446-07-01"
+    jsonl   {"jdn": 2460677, "gregorian": [2025, 1, 1], "hijri": [1446, 7, 1]}
+    binary  a header then one packed record per day (see HEADER and
+            record_struct), read back with read_binary()
+
+From the command line:
+
+    python -m multicalendar_libs.concordance 1900-01-01 2100-12-31 \\
+        --calendars=gregorian,hijri --format=csv --output=concordance.csv
+"""
+
+import argparse
+import struct
+import sys
+
+from multicalendar_libs import arguments, engines
+
+# Days converted at once
+CHUNK = 4096
+
+MAGIC = b"MCCT"
+VERSION = 1
+# magic, version, first JDN, number of days, length of the calendar names
+HEADER = struct.Struct("<4sHiIH")
+
+
+def record_struct(calendars):
+    """A record holds year (int16), month and day (uint8) of every calendar"""
+    return struct.Struct("<" + "hBB" * len(calendars))
+
+
+def rows(start, end, calendars, chunk=CHUNK):
+    """Generate (jdn, date, ...) for every JDN from start to end, a date per engine"""
+    for low in range(start, end + 1, chunk):
+        jdns = range(low, min(low + chunk, end + 1))
+        columns = []
+        for engine in calendars:
+            dates = engine.from_jdn_bulk(jdns)
+            if not isinstance(dates, list):
+                dates = dates.tolist()
+            columns.append(dates)
+        for row in zip(jdns, *columns):
+            yield row
+
+
+def _write_lines(out, lines):
+    # one write per CHUNK lines
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) == CHUNK:
+            out.write("".join(buffer))
+            del buffer[:]
+    out.write("".join(buffer))
+
+
+def write_csv(out, rows, names):
+    out.write(",".join(["jdn"] + list(names)) + "\n")
+    line = "%d" + ",%04d-%02d-%02d" * len(names) + "\n"
+    _write_lines(out, (line % ((row[0],) + tuple(part for d in row[1:] for part in d))
+                       for row in rows))
+
+
+def write_jsonl(out, rows, names):
+    line = '{"jdn": %d' + "".join(', "%s": [%%d, %%d, %%d]' % name for name in names) + "}\n"
+    _write_lines(out, (line % ((row[0],) + tuple(part for d in row[1:] for part in d))
+                       for row in rows))
+
+
+def write_binary(out, rows, names, start, end):
+    """Write to a binary stream, the days start to end are written in order"""
+    encoded = ",".join(names).encode("ascii")
+    out.write(HEADER.pack(MAGIC, VERSION, start, end - start + 1, len(encoded)))
+    out.write(encoded)
+    pack = record_struct(names).pack
+    for row in rows:
+        out.write(pack(*[part for d in row[1:] for part in d]))
+
+
+def read_binary(stream):
+    """Generate the (jdn, date, ...) rows of a binary concordance, and its names first"""
+    magic, version, start, days, length = HEADER.unpack(stream.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a concordance file of version {0}.".format(VERSION))
+    names = stream.read(length).decode("ascii").split(",")
+    yield names
+    record = record_struct(names)
+    for jdn in range(start, start + days):
+        values = record.unpack(stream.read(record.size))
+        yield (jdn,) + tuple(values[i:i + 3] for i in range(0, len(values), 3))
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def export(out, start, end, names, fmt="csv", adjust=0):
+    """Write the concordance of the JDNs start to end in the calendars names"""
+    calendars = [engines.engine(name, adjust) for name in names]
+    table = rows(start, end, calendars)
+    if fmt == "binary":
+        write_binary(out, table, names, start, end)
+    elif fmt in WRITERS:
+        WRITERS[fmt](out, table, names)
+    else:
+        raise ValueError('Unknown format "{0}", use csv, jsonl or binary.'.format(fmt))
+
+
+def main(args=None):
+    pars = argparse.ArgumentParser(
+        description="Export the dates of every day of a range in several calendars.")
+    pars.add_argument("start", help="First date, YYYY-MM-DD.")
+    pars.add_argument("end", help="Last date, YYYY-MM-DD.")
+    pars.add_argument("--calendar", default="gregorian",
+                      help="Calendar of the start and end dates.")
+    pars.add_argument("--calendars", default="gregorian,hijri",
+                      help="Comma separated calendars of the columns.")
+    pars.add_argument("--format", dest="fmt", default="csv", help="csv, jsonl or binary.")
+    pars.add_argument("--output", default=None, help="Output file (default: standard output).")
+    pars.add_argument("--adjust-hijri-date", type=int, dest="adjust_hijri_date", default=0)
+    pars.add_argument("--hijri-table", dest="hijri_table", default="",
+                      help="Hijri month start table (see multicalendar_libs.hijritable).")
+    pars.add_argument("--hijri-method", dest="hijri_method", default="tabular",
+                      help="tabular or astronomical Hijri month starts.")
+    pars.add_argument("--hijri-location", dest="hijri_location", default="21.4225,39.8262",
+                      help="LATITUDE,LONGITUDE of the astronomical Hijri month starts.")
+    pars.add_argument("--hijri-criterion", dest="hijri_criterion", default="mabims",
+                      help="Crescent visibility criterion of the astronomical month starts.")
+    options = pars.parse_args(args)
+
+    try:
+        if options.hijri_method == "astronomical":
+            from multicalendar_libs import astronomical, hijritable
+            latitude, longitude = astronomical.parse_location(options.hijri_location)
+            hijritable.install(astronomical.AstronomicalTable(latitude, longitude,
+                                                              options.hijri_criterion))
+        elif options.hijri_table:
+            from multicalendar_libs import hijritable
+            hijritable.install(options.hijri_table)
+        calendar = engines.engine(options.calendar, options.adjust_hijri_date)
+        try:
+            first, last = arguments.parse_date(options.start), arguments.parse_date(options.end)
+        except ValueError:
+            raise ValueError('The range dates must be given as YYYY-MM-DD.')
+        start, end = calendar.to_jdn(*first), calendar.to_jdn(*last)
+        if end < start:
+            raise ValueError('The end of the range is before its start.')
+        names = [name.strip() for name in options.calendars.split(",") if name.strip()]
+        for name in names:
+            engines.engine(name)
+        if options.fmt not in WRITERS and options.fmt != "binary":
+            raise ValueError('Unknown format "{0}", use csv, jsonl or binary.'.format(
+                options.fmt))
+        if options.output is None:
+            out = sys.stdout.buffer if options.fmt == "binary" else sys.stdout
+            export(out, start, end, names, options.fmt, options.adjust_hijri_date)
+        elif options.fmt == "binary":
+            with open(options.output, "wb") as out:
+                export(out, start, end, names, options.fmt, options.adjust_hijri_date)
+        else:
+            with open(options.output, "w", encoding="utf-8", newline="") as out:
+                export(out, start, end, names, options.fmt, options.adjust_hijri_date)
+    except ValueError as err:
+        sys.stderr.write("{0}\n".format(err))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
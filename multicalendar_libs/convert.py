@@ -1,6 +1,12 @@
 import datetime
 from math import floor
 
+# A multicalendar_libs.hijritable.HijriTable replacing the tabular Hijri month
+# starts in every conversion, installed with hijritable.install()
+hijri_table = None
+# A Counter of the conversions made, installed by multicalendar_libs.instrument
+counters = None
+
 class Gregorian:
     def __init__(self, year, month, day, adjust):
         self.year = year
@@ -9,6 +15,8 @@ class Gregorian:
         self.adjust = adjust
         
     def to_julian(self):
+        if counters is not None:
+            counters["conversions"] += 1
         adjust = datetime.datetime(self.year, self.month, self.day) - datetime.timedelta(self.adjust+1)
         jd = adjust.toordinal() + 1721425
         return jd
@@ -23,6 +31,10 @@ class Julian:
         self.adjust = adjust
 
     def to_hijri(self):
+        if counters is not None:
+            counters["conversions"] += 1
+        if hijri_table is not None:
+            return list(hijri_table.from_jdn(self.jd + 1))
         iyear = 10631.0/30.0
         epochastro = 1948084
         shift1 = 8.01/60.0
@@ -42,6 +54,8 @@ class Julian:
         return date
 
     def to_gregorian(self):
+        if counters is not None:
+            counters["conversions"] += 1
         gdate = datetime.date.fromordinal(self.jd - 1721425) - datetime.timedelta(1)
         yg = gdate.year
         mg = gdate.month
@@ -67,9 +81,153 @@ class Hijri:
         return int(c - b)
 
     def to_julian(self):
+        if counters is not None:
+            counters["conversions"] += 1
+        if hijri_table is not None:
+            return hijri_table.to_jdn(self.year, self.month, self.day, self.adjust) + 1
         jd = floor((11 * self.year + 3) / 30) + floor(354 * self.year) + floor(30 * self.month) - floor((self.month - 1) / 2) + (self.day+self.adjust+2) + 1948440 - 386
         return jd
 
     def to_gregorian(self):
         date = self.to_julian()
-        return Julian(date, self.adjust).to_gregorian()
\ No newline at end of file
+        return Julian(date, self.adjust).to_gregorian()
+
+# Bulk conversion
+#
+# The functions below convert whole arrays of dates in one call. They work on
+# true Julian Day Numbers (JDN = date.toordinal() + 1721425) and reproduce the
+# results of the Gregorian, Julian and Hijri classes above, including the
+# ``adjust`` shift and the month 13 clamp of Julian.to_hijri. Every formula is
+# plain floor division, so the same code runs on Python ints and on NumPy
+# int64 arrays. NumPy is used for large batches when it is installed and is
+# only imported then, so short lived processes never pay for its import;
+# otherwise lists are returned.
+
+JDN_ORDINAL_OFFSET = 1721425
+NUMPY_MIN_BATCH = 256
+
+numpy = None
+
+
+def load_numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        numpy = module
+    return numpy
+
+
+def _use_numpy(use_numpy, size):
+    if use_numpy is None:
+        return size >= NUMPY_MIN_BATCH and bool(load_numpy())
+    if use_numpy and not load_numpy():
+        raise ImportError("NumPy is not installed")
+    return use_numpy
+
+
+def gregorian_to_jdn(y, m, d):
+    a = (14 - m) // 12
+    y = y + 4800 - a
+    m = m + 12 * a - 3
+    return d + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+
+
+def jdn_to_gregorian(jdn):
+    a = jdn + 32044
+    b = (4 * a + 3) // 146097
+    c = a - 146097 * b // 4
+    d = (4 * c + 3) // 1461
+    e = c - 1461 * d // 4
+    m = (5 * e + 2) // 153
+    day = e - (153 * m + 2) // 5 + 1
+    month = m + 3 - 12 * (m // 10)
+    year = 100 * b + d - 4800 + m // 10
+    return year, month, day
+
+
+def hijri_to_jdn(y, m, d, adjust=0):
+    # Hijri(y, m, d, adjust).to_julian() - 1
+    if hijri_table is not None:
+        return hijri_table.to_jdn(y, m, d, adjust)
+    return tabular_hijri_to_jdn(y, m, d, adjust)
+
+
+def jdn_to_hijri(jdn, adjust=0):
+    # Julian(jdn - adjust - 1).to_hijri()
+    if hijri_table is not None:
+        return hijri_table.from_jdn(jdn, adjust)
+    return tabular_jdn_to_hijri(jdn, adjust)
+
+
+def tabular_hijri_to_jdn(y, m, d, adjust=0):
+    return (11 * y + 3) // 30 + 354 * y + 30 * m - (m - 1) // 2 + d + adjust + 1948055
+
+
+def tabular_jdn_to_hijri(jdn, adjust=0):
+    # Julian.to_hijri() with the float arithmetic rewritten as exact integer
+    # floor divisions
+    z = jdn - adjust - 1 - 1948084
+    cyc = z // 10631
+    z = z - 10631 * cyc
+    j = (30 * z - 5) // 10631
+    iy = 30 * cyc + j
+    z = z - (10631 * j + 4) // 30
+    im = (2 * z + 57) // 59
+    im = im - im // 13
+    id = z - (295001 * im - 290000) // 10000
+    return iy, im, id
+
+
+def _bulk_from_jdn(func, jdns, use_numpy, *args):
+    if not hasattr(jdns, "__len__"):
+        jdns = list(jdns)
+    if counters is not None:
+        counters["conversions"] += len(jdns)
+    if _use_numpy(use_numpy, len(jdns)):
+        jdns = numpy.asarray(jdns, dtype=numpy.int64).reshape(-1)
+        return numpy.stack(func(jdns, *args), axis=1)
+    return [list(func(jdn, *args)) for jdn in jdns]
+
+
+def _bulk_to_jdn(func, dates, use_numpy, *args):
+    if not hasattr(dates, "__len__"):
+        dates = list(dates)
+    if counters is not None:
+        counters["conversions"] += len(dates)
+    if _use_numpy(use_numpy, len(dates)):
+        dates = numpy.asarray(dates, dtype=numpy.int64).reshape(-1, 3)
+        return func(dates[:, 0], dates[:, 1], dates[:, 2], *args)
+    return [func(y, m, d, *args) for y, m, d in dates]
+
+
+def gregorian_to_jdn_bulk(dates, use_numpy=None):
+    """Convert a sequence of Gregorian (y, m, d) triples to JDNs"""
+    return _bulk_to_jdn(gregorian_to_jdn, dates, use_numpy)
+
+
+def jdn_to_gregorian_bulk(jdns, use_numpy=None):
+    """Convert a sequence of JDNs to Gregorian [y, m, d] triples"""
+    return _bulk_from_jdn(jdn_to_gregorian, jdns, use_numpy)
+
+
+def hijri_to_jdn_bulk(dates, adjust=0, use_numpy=None):
+    """Convert a sequence of Hijri (y, m, d) triples to JDNs"""
+    return _bulk_to_jdn(hijri_to_jdn, dates, use_numpy, adjust)
+
+
+def jdn_to_hijri_bulk(jdns, adjust=0, use_numpy=None):
+    """Convert a sequence of JDNs to Hijri [y, m, d] triples"""
+    return _bulk_from_jdn(jdn_to_hijri, jdns, use_numpy, adjust)
+
+
+def gregorian_to_hijri_bulk(dates, adjust=0, use_numpy=None):
+    """Bulk equivalent of Gregorian(y, m, d, adjust).to_hijri()"""
+    return jdn_to_hijri_bulk(gregorian_to_jdn_bulk(dates, use_numpy), adjust, use_numpy)
+
+
+def hijri_to_gregorian_bulk(dates, adjust=0, use_numpy=None):
+    """Bulk equivalent of Hijri(y, m, d, adjust).to_gregorian()"""
+    return jdn_to_gregorian_bulk(hijri_to_jdn_bulk(dates, adjust, use_numpy), use_numpy)
@@ -0,0 +1,354 @@
+"""
+Calendar engines: every calendar converts to and from Julian Day Numbers.
+
+An engine numbers the months of a year from 1 to months_in_year(year), in
+the order they occur, and converts (year, month, day) dates to integer JDNs
+and back, one at a time or in bulk. Converting between any two calendars is
+source.to_jdn() followed by target.from_jdn(): two integer transforms, no
+datetime objects. The engines are:
+
+    gregorian    the proleptic Gregorian calendar
+    hijri        the tabular Islamic calendar (Kuwaiti algorithm), or the
+                 month table installed by multicalendar_libs.hijritable
+                 (published or astronomical month starts), shifted by the
+                 adjust_hijri_date days
+    solar-hijri  the Persian (Jalali) calendar, with the 33 year cycle
+                 break years of Borkowski, valid for the years -61 to 3177
+    hebrew       the arithmetic Hebrew calendar, months counted from
+                 Tishrei, Adar I and Adar II being months 6 and 7 of leap
+                 years
+    javanese     the Javanese (Anno Javanico) calendar, windu of 8 years
+                 and kurup of 120 years anchored at Kurup Asapon (1 Sura
+                 1867 = 24 March 1936); its days are labelled with their
+                 pasaran, the 5 day market week
+
+Engines are created once per name and adjustment by engine().
+"""
+
+from functools import lru_cache
+
+from multicalendar_libs import convert
+
+PASARAN = ("Legi", "Pahing", "Pon", "Wage", "Kliwon")
+
+
+def _count(n):
+    if convert.counters is not None:
+        convert.counters["conversions"] += n
+
+
+class CalendarEngine(object):
+    """A calendar of 12 months a year, converting dates with to_jdn and from_jdn"""
+    name = None
+    # The option holding the localized month names, else month_names is used
+    names_option = None
+    month_names = ()
+
+    def __init__(self, adjust=0):
+        self.adjust = adjust
+
+    def to_jdn(self, y, m, d):
+        raise NotImplementedError
+
+    def from_jdn(self, jdn):
+        """The (year, month, day) of a JDN"""
+        raise NotImplementedError
+
+    def months_in_year(self, y):
+        return 12
+
+    def month_start(self, y, m):
+        """The JDN of the first day of month m of year y"""
+        return self.to_jdn(y, m, 1)
+
+    def month_length(self, y, m):
+        return self.month_start(*self.shift_month(y, m, 1)) - self.month_start(y, m)
+
+    def month_index(self, y, m):
+        """The number of months from the epoch to month m of year y"""
+        return y * 12 + m - 1
+
+    def from_month_index(self, index):
+        y, m = divmod(index, 12)
+        return y, m + 1
+
+    def shift_month(self, y, m, delta):
+        return self.from_month_index(self.month_index(y, m) + delta)
+
+    def month_name(self, y, m):
+        return self.month_names[m - 1]
+
+    def day_label(self, jdn):
+        """A name shown next to the day number of a JDN, or None"""
+        return None
+
+    def to_jdn_bulk(self, dates):
+        """Convert a sequence of (y, m, d) triples to JDNs"""
+        dates = list(dates)
+        _count(len(dates))
+        return [self.to_jdn(y, m, d) for y, m, d in dates]
+
+    def from_jdn_bulk(self, jdns):
+        """Convert a sequence of JDNs to [y, m, d] triples"""
+        jdns = list(jdns)
+        _count(len(jdns))
+        return [list(self.from_jdn(jdn)) for jdn in jdns]
+
+
+class GregorianEngine(CalendarEngine):
+    name = "gregorian"
+    names_option = "month_names"
+
+    def to_jdn(self, y, m, d):
+        return convert.gregorian_to_jdn(y, m, d)
+
+    def from_jdn(self, jdn):
+        return convert.jdn_to_gregorian(jdn)
+
+    def to_jdn_bulk(self, dates):
+        return convert.gregorian_to_jdn_bulk(dates)
+
+    def from_jdn_bulk(self, jdns):
+        return convert.jdn_to_gregorian_bulk(jdns)
+
+
+class HijriEngine(CalendarEngine):
+    name = "hijri"
+    names_option = "hijri_month_names"
+
+    def to_jdn(self, y, m, d):
+        return convert.hijri_to_jdn(y, m, d, self.adjust)
+
+    def from_jdn(self, jdn):
+        return convert.jdn_to_hijri(jdn, self.adjust)
+
+    def to_jdn_bulk(self, dates):
+        return convert.hijri_to_jdn_bulk(dates, self.adjust)
+
+    def from_jdn_bulk(self, jdns):
+        return convert.jdn_to_hijri_bulk(jdns, self.adjust)
+
+
+# Years starting a new 33 year cycle pattern of the Jalali leap years
+JALALI_BREAKS = (-61, 9, 38, 199, 426, 686, 756, 818, 1111, 1181, 1210, 1635, 2060, 2097,
+                 2192, 2262, 2324, 2394, 2456, 3178)
+
+
+def _div(a, b):
+    # division truncating towards zero, as in the published algorithm
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _mod(a, b):
+    return a - _div(a, b) * b
+
+
+@lru_cache(maxsize=256)
+def jalali_year(jy):
+    """
+    (leap, day of March of 1 Farvardin) of Solar Hijri year jy, leap being the
+    years since the last leap year (0 in leap years)
+    """
+    if not JALALI_BREAKS[0] <= jy < JALALI_BREAKS[-1]:
+        raise ValueError('Solar Hijri year {0} is out of range.'.format(jy))
+    gy = jy + 621
+    leap_j = -14
+    jp = JALALI_BREAKS[0]
+    jump = 0
+    for jm in JALALI_BREAKS[1:]:
+        jump = jm - jp
+        if jy < jm:
+            break
+        leap_j += _div(jump, 33) * 8 + _div(_mod(jump, 33), 4)
+        jp = jm
+    n = jy - jp
+    leap_j += _div(n, 33) * 8 + _div(_mod(n, 33) + 3, 4)
+    if _mod(jump, 33) == 4 and jump - n == 4:
+        leap_j += 1
+    leap_g = _div(gy, 4) - _div((_div(gy, 100) + 1) * 3, 4) - 150
+    march = 20 + leap_j - leap_g
+    if jump - n < 6:
+        n = n - jump + _div(jump + 4, 33) * 33
+    leap = _mod(_mod(n + 1, 33) - 1, 4)
+    if leap == -1:
+        leap = 4
+    return leap, march
+
+
+class SolarHijriEngine(CalendarEngine):
+    name = "solar-hijri"
+    month_names = ("Farvardin", "Ordibehesht", "Khordad", "Tir", "Mordad", "Shahrivar",
+                   "Mehr", "Aban", "Azar", "Dey", "Bahman", "Esfand")
+
+    def year_start(self, y):
+        return convert.gregorian_to_jdn(y + 621, 3, jalali_year(y)[1])
+
+    def to_jdn(self, y, m, d):
+        # 6 months of 31 days then 30 days
+        return self.year_start(y) + (m - 1) * 31 - m // 7 * (m - 7) + d - 1
+
+    def from_jdn(self, jdn):
+        y = convert.jdn_to_gregorian(jdn)[0] - 621
+        k = jdn - self.year_start(y)
+        if k >= 0:
+            if k <= 185:
+                return y, 1 + k // 31, k % 31 + 1
+            k -= 186
+        else:
+            # in Esfand of the year before, long when it was a leap year
+            k += 179
+            if jalali_year(y)[0] == 1:
+                k += 1
+            y -= 1
+        return y, 7 + k // 30, k % 30 + 1
+
+
+HEBREW_MONTHS = ("Tishrei", "Heshvan", "Kislev", "Tevet", "Shevat", "Adar",
+                 "Nisan", "Iyar", "Sivan", "Tammuz", "Av", "Elul")
+HEBREW_LEAP_MONTHS = HEBREW_MONTHS[:5] + ("Adar I", "Adar II") + HEBREW_MONTHS[6:]
+# The JDN of 1 Tishrei of year 1
+HEBREW_EPOCH = 347998
+
+
+def hebrew_leap(y):
+    return (7 * y + 1) % 19 < 7
+
+
+def hebrew_months_before(y):
+    """The months from the epoch to 1 Tishrei of year y"""
+    return (235 * y - 234) // 19
+
+
+def hebrew_elapsed_days(y):
+    months = hebrew_months_before(y)
+    parts = 12084 + 13753 * months
+    days = 29 * months + parts // 25920
+    # 1 Tishrei never falls on Sunday, Wednesday or Friday
+    if (3 * (days + 1)) % 7 < 3:
+        days += 1
+    return days
+
+
+@lru_cache(maxsize=256)
+def hebrew_new_year(y):
+    """The JDN of 1 Tishrei of year y"""
+    before, elapsed, after = (hebrew_elapsed_days(y - 1), hebrew_elapsed_days(y),
+                              hebrew_elapsed_days(y + 1))
+    # keep the years within their allowed lengths
+    if after - elapsed == 356:
+        elapsed += 2
+    elif elapsed - before == 382:
+        elapsed += 1
+    return HEBREW_EPOCH + elapsed
+
+
+@lru_cache(maxsize=256)
+def hebrew_month_starts(y):
+    """The JDN of the first day of every month of year y, and of the next year"""
+    length = hebrew_new_year(y + 1) - hebrew_new_year(y)
+    lengths = [30, 29, 30, 29, 30, 29, 30, 29, 30, 29, 30, 29]
+    if length % 10 == 5:
+        lengths[1] = 30  # long Heshvan
+    elif length % 10 == 3:
+        lengths[2] = 29  # short Kislev
+    if hebrew_leap(y):
+        lengths[5:6] = [30, 29]
+    starts = [hebrew_new_year(y)]
+    for days in lengths:
+        starts.append(starts[-1] + days)
+    return tuple(starts)
+
+
+class HebrewEngine(CalendarEngine):
+    name = "hebrew"
+
+    def months_in_year(self, y):
+        return 13 if hebrew_leap(y) else 12
+
+    def to_jdn(self, y, m, d):
+        return hebrew_month_starts(y)[m - 1] + d - 1
+
+    def from_jdn(self, jdn):
+        y = (jdn - HEBREW_EPOCH) * 98496 // 35975351 + 1
+        if hebrew_new_year(y) > jdn:
+            y -= 1
+        elif hebrew_new_year(y + 1) <= jdn:
+            y += 1
+        starts = hebrew_month_starts(y)
+        m = 1
+        while starts[m] <= jdn:
+            m += 1
+        return y, m, jdn - starts[m - 1] + 1
+
+    def month_index(self, y, m):
+        return hebrew_months_before(y) + m - 1
+
+    def from_month_index(self, index):
+        y = (19 * index + 234) // 235 + 1
+        while hebrew_months_before(y) > index:
+            y -= 1
+        while hebrew_months_before(y + 1) <= index:
+            y += 1
+        return y, index - hebrew_months_before(y) + 1
+
+    def month_name(self, y, m):
+        return (HEBREW_LEAP_MONTHS if hebrew_leap(y) else HEBREW_MONTHS)[m - 1]
+
+
+# 1 Sura 1867, the first day of Kurup Asapon (24 March 1936)
+JAVANESE_EPOCH = 2428252
+JAVANESE_EPOCH_YEAR = 1867
+# Days from the start of a windu to each of its years (Alip, Ehe, Jimawal,
+# Je, Dal, Be, Wawu, Jimakir); Ehe, Dal and Jimakir have 355 days
+WINDU_YEARS = (0, 354, 709, 1063, 1417, 1772, 2126, 2480)
+WINDU_DAYS = 2835
+# 15 windu, the last Jimakir of a kurup having 354 days
+KURUP_DAYS = 15 * WINDU_DAYS - 1
+
+
+class JavaneseEngine(CalendarEngine):
+    name = "javanese"
+    month_names = ("Sura", "Sapar", "Mulud", "Bakda Mulud", "Jumadilawal", "Jumadilakir",
+                   "Rejeb", "Ruwah", "Pasa", "Sawal", "Sela", "Besar")
+
+    def to_jdn(self, y, m, d):
+        kurup, year = divmod(y - JAVANESE_EPOCH_YEAR, 120)
+        windu, year = divmod(year, 8)
+        # months alternate 30 and 29 days, Besar has 30 in the long years
+        return (JAVANESE_EPOCH + kurup * KURUP_DAYS + windu * WINDU_DAYS + WINDU_YEARS[year] +
+                29 * (m - 1) + m // 2 + d - 1)
+
+    def from_jdn(self, jdn):
+        kurup, days = divmod(jdn - JAVANESE_EPOCH, KURUP_DAYS)
+        windu, days = divmod(days, WINDU_DAYS)
+        year = 7
+        while WINDU_YEARS[year] > days:
+            year -= 1
+        days -= WINDU_YEARS[year]
+        m = min(2 * days // 59 + 1, 12)
+        return (JAVANESE_EPOCH_YEAR + 120 * kurup + 8 * windu + year, m,
+                days - 29 * (m - 1) - m // 2 + 1)
+
+    def day_label(self, jdn):
+        return PASARAN[jdn % 5]
+
+
+ENGINES = dict((cls.name, cls) for cls in (GregorianEngine, HijriEngine, SolarHijriEngine,
+                                            HebrewEngine, JavaneseEngine))
+
+
+@lru_cache(maxsize=None)
+def engine(name, adjust=0):
+    """The engine of a calendar name, adjust only shifts the Hijri calendar"""
+    try:
+        cls = ENGINES[name]
+    except KeyError:
+        raise ValueError('Unknown calendar "{0}", use one of {1}.'.format(
+            name, ", ".join(sorted(ENGINES))))
+    return cls(adjust if cls is HijriEngine else 0)
+
+
+def convert_date(date, source, target):
+    """Convert a (y, m, d) date of the engine source to the engine target"""
+    return target.from_jdn(source.to_jdn(*date))
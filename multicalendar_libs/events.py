@@ -0,0 +1,297 @@
+"""
+Events and holidays overlaid on the calendar days.
+
+Events are read from iCalendar (.ics) or CSV files, streamed line by line so
+feeds of any size only keep what falls in the rendered days:
+
+    ics  every VEVENT with its DTSTART, DTEND or DURATION and SUMMARY.
+         RRULE:FREQ=YEARLY repeats it every year, in the Gregorian calendar
+         or in the one of its RSCALE (RFC 7529: ISLAMIC-CIVIL, ISLAMIC,
+         PERSIAN, HEBREW), until its UNTIL or COUNT. Other rules only keep
+         their first occurrence.
+    csv  a header row naming the columns start, end (optional, inclusive),
+         summary, calendar (optional, any engine, gregorian by default) and
+         repeat (optional, "yearly"), dates as YYYY-MM-DD of the calendar:
+
+             start,end,summary,calendar,repeat
+             2025-12-24,2025-12-26,Office closed,,
+             1446-09-01,,Ramadan,hijri,yearly
+
+An EventIndex covers a window of JDNs: every event is clipped to it and
+yearly events are expanded for the years it spans, through the calendar
+engines (so Hijri events follow the adjustment and month table of the
+render). The window is then cut into segments at every event start and end,
+each holding the summaries of the events covering it, and events_at() is a
+single bisect over the segment bounds: O(log n) per day whatever the size of
+the feeds.
+"""
+
+import csv
+import os
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from functools import lru_cache
+
+from multicalendar_libs import convert, engines
+
+# start and end are inclusive JDNs
+Event = namedtuple("Event", "start end summary")
+# A yearly event on month/day of calendar, lasting length days, from the year
+# first_year to last_year (None for no end)
+YearlyEvent = namedtuple("YearlyEvent", "calendar month day length first_year last_year summary")
+
+# RRULE RSCALE values and their engines
+RSCALES = {"GREGORIAN": "gregorian", "ISLAMIC-CIVIL": "hijri", "ISLAMIC": "hijri",
+           "ISLAMIC-TBLA": "hijri", "ISLAMIC-UMALQURA": "hijri", "PERSIAN": "solar-hijri",
+           "HEBREW": "hebrew"}
+
+
+def feed_paths(value):
+    """The files of the events option, comma separated"""
+    return tuple(path.strip() for path in value.split(",") if path.strip())
+
+
+def feed_stamps(value):
+    """(path, mtime, size) of every feed, what an index built from them depends on"""
+    stamps = []
+    for path in feed_paths(value):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise ValueError('Cannot read the events file "{0}".'.format(path))
+        stamps.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def ics_date(value):
+    """The Gregorian (y, m, d) of an iCalendar DATE or DATE-TIME, and whether it has a time"""
+    return (int(value[:4]), int(value[4:6]), int(value[6:8])), "T" in value
+
+
+def ics_days(value):
+    """The number of days of an iCalendar DURATION such as P3D or P1W"""
+    days = 0
+    number = ""
+    for char in value.lstrip("+P"):
+        if char.isdigit():
+            number += char
+        elif char == "W":
+            days += 7 * int(number)
+            number = ""
+        elif char == "D":
+            days += int(number)
+            number = ""
+        elif char == "T":
+            break
+        else:
+            number = ""
+    return max(days, 1)
+
+
+def ics_text(value):
+    return (value.replace("\\n", " ").replace("\\N", " ").replace("\\,", ",")
+            .replace("\\;", ";").replace("\\\\", "\\"))
+
+
+def ics_lines(stream):
+    """The unfolded (name, parameters, value) content lines of an iCalendar stream"""
+    line = None
+    for raw in stream:
+        raw = raw.rstrip("\r\n")
+        if raw[:1] in (" ", "\t"):
+            line = (line or "") + raw[1:]
+            continue
+        if line:
+            yield _content_line(line)
+        line = raw
+    if line:
+        yield _content_line(line)
+
+
+def _content_line(line):
+    head, _, value = line.partition(":")
+    name, _, parameters = head.partition(";")
+    return name.upper(), parameters.upper(), value
+
+
+def _ics_event(props, path, adjust):
+    if "DTSTART" not in props:
+        raise ValueError('An event of "{0}" has no DTSTART.'.format(path))
+    date, _ = ics_date(props["DTSTART"])
+    start = convert.gregorian_to_jdn(*date)
+    if "DTEND" in props:
+        end_date, end_timed = ics_date(props["DTEND"])
+        end = convert.gregorian_to_jdn(*end_date)
+        # the end of an all day event, or midnight, is exclusive
+        if not end_timed or props["DTEND"][9:15] in ("", "000000"):
+            end -= 1
+        end = max(end, start)
+    elif "DURATION" in props:
+        end = start + ics_days(props["DURATION"]) - 1
+    else:
+        end = start
+    summary = ics_text(props.get("SUMMARY", ""))
+    rule = dict(part.partition("=")[::2] for part in props.get("RRULE", "").upper().split(";")
+                if part)
+    if rule.get("FREQ") != "YEARLY":
+        return Event(start, end, summary)
+    calendar = RSCALES.get(rule.get("RSCALE", "GREGORIAN"), "gregorian")
+    engine = engines.engine(calendar, adjust)
+    y, m, d = engine.from_jdn(start)
+    last_year = None
+    if "UNTIL" in rule:
+        last_year = engine.from_jdn(
+            convert.gregorian_to_jdn(*ics_date(rule["UNTIL"])[0]))[0]
+    elif "COUNT" in rule:
+        last_year = y + int(rule["COUNT"]) - 1
+    return YearlyEvent(calendar, m, d, end - start + 1, y, last_year, summary)
+
+
+def read_ics(stream, path="<stream>", adjust=0):
+    """Generate the Event and YearlyEvent of an iCalendar stream"""
+    props = None
+    for name, _, value in ics_lines(stream):
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            props = {}
+        elif name == "END" and value.upper() == "VEVENT" and props is not None:
+            try:
+                yield _ics_event(props, path, adjust)
+            except (ValueError, IndexError):
+                raise ValueError('Invalid event in "{0}": {1}'.format(
+                    path, props.get("SUMMARY", props.get("DTSTART", ""))))
+            props = None
+        elif props is not None and name not in props:
+            props[name] = value
+
+
+def csv_date(value):
+    """Parse "YYYY-MM-DD" into a (year, month, day) tuple"""
+    parts = value.split("-")
+    if len(parts) != 3:
+        raise ValueError(value)
+    return int(parts[0]), int(parts[1]), int(parts[2])
+
+
+def read_csv(stream, path="<stream>", adjust=0):
+    """Generate the Event and YearlyEvent of a CSV stream"""
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    if "start" not in header:
+        raise ValueError('The events file "{0}" has no start column.'.format(path))
+    # missing columns read the empty padding after the last one
+    width = len(header)
+    start_col, end_col, summary_col, calendar_col, repeat_col = (
+        header.index(name) if name in header else width
+        for name in ("start", "end", "summary", "calendar", "repeat"))
+    padding = [""] * (width + 1)
+    for number, row in enumerate(reader, 2):
+        if len(row) <= width:
+            row = row + padding[len(row):]
+        first = row[start_col].strip()
+        if not first:
+            continue
+        calendar = row[calendar_col].strip() or "gregorian"
+        engine = engines.engine(calendar, adjust)
+        try:
+            first = csv_date(first)
+            last = row[end_col].strip()
+            last = csv_date(last) if last else first
+            start, end = engine.to_jdn(*first), engine.to_jdn(*last)
+        except ValueError:
+            raise ValueError('Invalid dates on line {0} of "{1}".'.format(number, path))
+        if end < start:
+            raise ValueError('The event on line {0} of "{1}" ends before it starts.'.format(
+                number, path))
+        repeat = row[repeat_col].strip().lower()
+        if repeat == "yearly":
+            yield YearlyEvent(calendar, first[1], first[2], end - start + 1, first[0], None,
+                              row[summary_col].strip())
+        elif repeat:
+            raise ValueError('Unknown repeat "{0}" on line {1} of "{2}", use yearly.'.format(
+                repeat, number, path))
+        else:
+            yield Event(start, end, row[summary_col].strip())
+
+
+def read_feed(path, adjust=0):
+    """Generate the events of an .ics or .csv file, Hijri dates shifted by adjust"""
+    reader = read_ics if path.lower().endswith((".ics", ".ical")) else read_csv
+    try:
+        with open(path, encoding="utf-8-sig", newline="") as stream:
+            for event in reader(stream, path, adjust):
+                yield event
+    except OSError:
+        raise ValueError('Cannot read the events file "{0}".'.format(path))
+
+
+def occurrences(event, first, last, adjust=0):
+    """The (start, end) JDNs of the occurrences of a YearlyEvent overlapping first to last"""
+    engine = engines.engine(event.calendar, adjust)
+    years = range(max(engine.from_jdn(first - event.length + 1)[0], event.first_year),
+                  engine.from_jdn(last)[0] + 1)
+    for y in years:
+        if event.last_year is not None and y > event.last_year:
+            break
+        # skip the years without that date (29 February, Adar II, ...)
+        if event.month > engine.months_in_year(y) or \
+                event.day > engine.month_length(y, event.month):
+            continue
+        start = engine.to_jdn(y, event.month, event.day)
+        if start <= last and start + event.length - 1 >= first:
+            yield start, start + event.length - 1
+
+
+class EventIndex(object):
+    """The summaries of the events of every day from first to last"""
+
+    def __init__(self, first, last, events, adjust=0):
+        self.first = first
+        self.last = last
+        intervals = []
+        for event in events:
+            if isinstance(event, YearlyEvent):
+                for start, end in occurrences(event, first, last, adjust):
+                    intervals.append((max(start, first), min(end, last), len(intervals),
+                                      event.summary))
+            elif event.start <= last and event.end >= first:
+                intervals.append((max(event.start, first), min(event.end, last),
+                                  len(intervals), event.summary))
+        # cut the window at every start and end, in feed order within a day
+        intervals.sort()
+        bounds = sorted(set([start for start, _, _, _ in intervals] +
+                            [end + 1 for _, end, _, _ in intervals]))
+        self.bounds = array("l", bounds)
+        self.segments = []
+        active = []
+        following = 0
+        for bound in bounds:
+            active = [interval for interval in active if interval[1] >= bound]
+            while following < len(intervals) and intervals[following][0] == bound:
+                active.append(intervals[following])
+                following += 1
+            active.sort(key=lambda interval: interval[2])
+            self.segments.append(tuple(interval[3] for interval in active))
+
+    def __len__(self):
+        return len(self.segments)
+
+    def events_at(self, jdn):
+        """The summaries of the events on the day jdn"""
+        index = bisect_right(self.bounds, jdn) - 1
+        if index < 0:
+            return ()
+        return self.segments[index]
+
+
+def stream_feeds(paths, adjust=0):
+    for path in paths:
+        for event in read_feed(path, adjust):
+            yield event
+
+
+@lru_cache(maxsize=4)
+def load(stamps, first, last, adjust, table):
+    """The index of the feeds of stamps over first to last, built once per render"""
+    # table is the installed Hijri month table, part of the key only
+    return EventIndex(first, last, stream_feeds([stamp[0] for stamp in stamps], adjust), adjust)
@@ -0,0 +1,169 @@
+"""
+On-disk cache of rendered month fragments.
+
+Every month group is stored as markup under the SHA-256 of everything its
+rendering depends on: the month, its place, the options used by the layout
+and create_month, the sizes and the style attributes, the Hijri month table
+and the event feeds. In the class style mode the texts only hold class names, so changing a
+color or a font only changes the stylesheet and every month is a hit. Months
+found in the cache are neither laid out nor rendered again.
+
+Files are kept in a directory (by default in the user cache directory) and
+touched when read; the least recently used ones are removed once the cache
+grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from multicalendar_libs import arguments, convert, instrument, layout, parallel
+
+# Bump when the markup of a month changes for the same inputs
+CACHE_VERSION = 1
+# Options the model or the rendering of a month depends on
+MONTH_OPTIONS = ("primary_calendar", "secondary_calendar", "adjust_hijri_date", "start_day",
+                 "weekend", "fill_edb", "show_weeknr", "week_numbering", "enable_secondary_date",
+                 "use_farsi_day", "digits", "use_symbols", "month_names", "hijri_month_names",
+                 "day_names", "weeknr_name", "input_encode", "style_mode")
+# Renderer sizes create_month depends on
+MONTH_SIZES = ("cols_before", "month_w", "month_h", "month_margin", "day_w", "day_h",
+               "year_margin")
+# The entries written by put(), trim() leaves everything else alone
+PREFIX_NAME = re.compile(r"[0-9a-f]{2}\Z")
+FRAGMENT_NAME = re.compile(r"[0-9a-f]{64}\.svgf\Z")
+
+
+def default_directory():
+    return arguments.cache_directory("fragments")
+
+
+class FragmentCache(object):
+    """A directory of markup files named by their key, bounded to max_bytes"""
+
+    def __init__(self, directory=None, max_bytes=64 * 1024 * 1024):
+        self.directory = directory or default_directory()
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".svgf")
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, encoding="utf-8") as fragment:
+                markup = fragment.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return markup
+
+    def put(self, key, markup):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write aside and rename, so a concurrent run never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fragment:
+            fragment.write(markup)
+        os.replace(tmp, path)
+
+    def entries(self):
+        """(mtime, size, path) of the fragment files, <2 hex>/<sha256>.svgf"""
+        try:
+            prefixes = [entry for entry in os.scandir(self.directory)
+                        if PREFIX_NAME.match(entry.name) and entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return
+        for prefix in prefixes:
+            try:
+                names = [entry for entry in os.scandir(prefix.path)
+                         if FRAGMENT_NAME.match(entry.name) and
+                         entry.name.startswith(prefix.name) and
+                         entry.is_file(follow_symlinks=False)]
+            except OSError:
+                continue
+            for entry in names:
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+
+    def trim(self):
+        """Remove the least recently used fragments until the cache fits its size"""
+        # only the files put() wrote: the directory may be shared with others
+        files = sorted(self.entries())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def table_digest():
+    table = convert.hijri_table
+    if table is None:
+        return None
+    if hasattr(table, "parameters"):
+        # computed tables grow on demand, their starts follow from these
+        return hashlib.sha256(repr(table.parameters).encode("utf-8")).hexdigest()
+    return hashlib.sha256(bytes(memoryview(table.starts).cast("B"))).hexdigest()
+
+
+def month_key(renderer, y, m, slot, digest=None):
+    """The cache key of month m of year y rendered at slot by renderer"""
+    options = renderer.options
+    data = [
+        CACHE_VERSION, y, m, slot % renderer.months_per_line, slot // renderer.months_per_line,
+        bool(options.range_start), digest,
+        [getattr(options, name) for name in MONTH_OPTIONS],
+        [getattr(renderer, name) for name in MONTH_SIZES],
+        renderer.style_atts,
+    ]
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def render_months(renderer, day_names, cache):
+    """The markup of every month of renderer, from cache or rendered and stored"""
+    options = renderer.options
+    # a month also depends on the Hijri table and on the event feeds
+    digest = [table_digest()]
+    if options.events:
+        from multicalendar_libs import events
+        digest.append(events.feed_stamps(options.events))
+    keys = [month_key(renderer, y, m, slot, digest)
+            for slot, (y, m) in enumerate(layout.month_slots(options))]
+    markups = [cache.get(key) for key in keys]
+    missing = [slot for slot, markup in enumerate(markups) if markup is None]
+    instrument.count("fragment_cache_hits", len(keys) - len(missing))
+    instrument.count("fragment_cache_misses", len(missing))
+    if not missing:
+        return markups
+
+    # lay out the runs of consecutive missing months
+    models = []
+    start = 0
+    while start < len(missing):
+        end = start
+        while end + 1 < len(missing) and missing[end + 1] == missing[end] + 1:
+            end += 1
+        models.extend(layout.build_months(options, renderer.months_per_line,
+                                          missing[start], end - start + 1))
+        start = end + 1
+    if options.workers != 1 and len(models) > 1:
+        rendered = parallel.render_months(renderer, models, day_names,
+                                          parallel.workers_for(options))
+    else:
+        fragments = parallel.FragmentRenderer(parallel.renderer_state(renderer))
+        rendered = [fragments.render(model, day_names) for model in models]
+    for slot, markup in zip(missing, rendered):
+        markups[slot] = markup
+        cache.put(keys[slot], markup)
+    cache.trim()
+    return markups
@@ -0,0 +1,138 @@
+"""
+Headless calendar generator.
+
+Renders the same calendars as the Inkscape extension straight to an SVG file,
+without inkex or lxml, so it starts fast enough to be spawned by batch jobs:
+
+    python -m multicalendar_libs.headless --year=2024 --output=2024.svg
+
+It accepts every option of the extension (see multicalendar_libs.arguments)
+plus the output path and the page size.
+"""
+
+import argparse
+import re
+import sys
+
+from multicalendar_libs import arguments, instrument, svgwriter
+from multicalendar_libs.render import CalendarRenderer
+
+# User units per unit, for documents whose user unit is one pixel
+PX_PER_UNIT = {
+    'px': 1.0,
+    'pt': 96.0 / 72.0,
+    'pc': 16.0,
+    'mm': 96.0 / 25.4,
+    'cm': 96.0 / 2.54,
+    'in': 96.0,
+}
+
+
+def parse_length(value):
+    """Split "210mm" into (210.0, "mm"), a bare number is in px"""
+    m = re.match(r'^\s*([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-z]*)\s*$', str(value))
+    if m is None or (m.group(2) and m.group(2) not in PX_PER_UNIT):
+        raise ValueError('Invalid length "{0}"'.format(value))
+    return float(m.group(1)), m.group(2) or 'px'
+
+
+class HeadlessCalendar(CalendarRenderer):
+    """Generate a calendar SVG without Inkscape"""
+    elements = svgwriter
+
+    def __init__(self):
+        self.arg_parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+        self.arg_parser.add_argument(
+            "--output", type=str, default=None,
+            help='Write the SVG to this file instead of the standard output.')
+        self.arg_parser.add_argument(
+            "--stream", type=arguments.boolean, default=False,
+            help='Write every month as soon as it is rendered, so memory stays flat '
+                 'for documents of any span (the months are rendered in this process).')
+        self.arg_parser.add_argument(
+            "--page-width", type=str, dest="page_width", default="210mm",
+            help='Width of the generated document.')
+        self.arg_parser.add_argument(
+            "--page-height", type=str, dest="page_height", default="297mm",
+            help='Height of the generated document.')
+        arguments.add_arguments(self.arg_parser)
+        self.options = None
+        self.document = None
+
+    def errormsg(self, msg):
+        sys.stderr.write(msg + "\n")
+
+    def unittouu(self, value):
+        number, unit = parse_length(value)
+        return number * PX_PER_UNIT[unit] / PX_PER_UNIT[self.document.unit]
+
+    def add_fragment(self, parent, markup):
+        parent.add(svgwriter.Fragment(markup))
+
+    def parse_arguments(self, args):
+        self.options = self.arg_parser.parse_args(args)
+        instrument.start_for(self.options)
+        width, unit = parse_length(self.options.page_width)
+        height, height_unit = parse_length(self.options.page_height)
+        height = height * PX_PER_UNIT[height_unit] / PX_PER_UNIT[unit]
+        self.document = svgwriter.Document(width, height, unit)
+        with instrument.phase("validate_options"):
+            arguments.validate_options(self.options, self.unittouu, self.errormsg)
+
+    def save(self, output):
+        if output is None:
+            self.document.write(sys.stdout)
+        else:
+            with open(output, "w", encoding="utf-8") as out:
+                self.document.write(out)
+
+    def stream(self, out):
+        """Render the calendar to out month by month, only one month is kept"""
+        root = self.document.getroot()
+        with instrument.phase("generate"):
+            with instrument.phase("calculate_size_and_positions"):
+                self.calculate_size_and_positions()
+            model = self.build_model(lazy=True)
+            self.write_year_header(svgwriter.Group(), model)
+            out.write(svgwriter.XML_DECLARATION)
+            out.write(root.start_tag())
+            out.write(self.year_g.start_tag())
+            for child in self.year_g.children:
+                child.write(out)
+            out.flush()
+            for month in model.months:
+                del self.year_g.children[:]
+                with instrument.phase("month_{0}_{1}".format(month.month, month.year)):
+                    self.create_month(month, model.day_names)
+                for child in self.year_g.children:
+                    child.write(out)
+            out.write(self.year_g.end_tag())
+            out.write(root.end_tag())
+            out.write("\n")
+
+    def run(self, args=None):
+        try:
+            self.parse_arguments(sys.argv[1:] if args is None else args)
+            if self.options.stream and self.options.output is None:
+                self.stream(sys.stdout)
+            elif self.options.stream:
+                with open(self.options.output, "w", encoding="utf-8") as out:
+                    self.stream(out)
+            else:
+                self.generate(self.document.getroot())
+                with instrument.phase("save"):
+                    self.save(self.options.output)
+        except ValueError as err:
+            self.errormsg(str(err))
+            return 1
+        finally:
+            instrument.stop()
+        return 0
+
+
+def main(args=None):
+    return HeadlessCalendar().run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""
+Precomputed Hijri month start table.
+
+A HijriTable holds the JDN of the first day of every Hijri month over a range
+of years, so conversions become a bisect over the month starts and month
+lengths a subtraction. The table starts from the tabular (Kuwaiti) month
+starts and can take officially published month starts instead, such as the
+Umm al-Qura calendar or the sightings announced by a local authority.
+
+Tables are stored as a compact little-endian binary file (a header followed by
+one int32 per month) that is memory-mapped when loaded. Build one with:
+
+    python -m multicalendar_libs.hijritable build table.bin \\
+        --first-year=1300 --last-year=1600 --overrides=sightings.csv
+
+The overrides file is a CSV of "hijri year,hijri month,YYYY-MM-DD" rows, the
+last column being the Gregorian date of the first day of that month. The
+extension uses a table with --hijri-table=table.bin.
+"""
+
+import argparse
+import csv
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+
+from multicalendar_libs import convert
+
+MAGIC = b"MCHT"
+VERSION = 1
+# magic, version, first year, number of years
+HEADER = struct.Struct("<4sHiI")
+
+
+class HijriTable(object):
+    """Month start JDNs of the Hijri years first_year to first_year + years - 1"""
+
+    def __init__(self, first_year, starts):
+        # starts holds one more entry than months: the start of the month
+        # following the table, giving the length of its last month
+        self.first_year = first_year
+        self.starts = starts
+        self.months = len(starts) - 1
+        self.years = self.months // 12
+        self._array = None
+
+    @classmethod
+    def tabular(cls, first_year, last_year):
+        """A table of the tabular month starts (adjust 0)"""
+        starts = array("i", (convert.tabular_hijri_to_jdn(y, m, 1)
+                             for y in range(first_year, last_year + 1)
+                             for m in range(1, 13)))
+        starts.append(convert.tabular_hijri_to_jdn(last_year + 1, 1, 1))
+        return cls(first_year, starts)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a table file"""
+        with open(path, "rb") as table_file:
+            data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, first_year, years = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('"{0}" is not a Hijri month table.'.format(path))
+        if len(data) != HEADER.size + 4 * (years * 12 + 1):
+            raise ValueError('The Hijri month table "{0}" is truncated.'.format(path))
+        if sys.byteorder == "little":
+            starts = memoryview(data)[HEADER.size:].cast("i")
+        else:
+            starts = array("i", data[HEADER.size:])
+            starts.byteswap()
+        return cls(first_year, starts)
+
+    def save(self, path):
+        starts = array("i", self.starts)
+        if sys.byteorder != "little":
+            starts.byteswap()
+        with open(path, "wb") as table_file:
+            table_file.write(HEADER.pack(MAGIC, VERSION, self.first_year, self.years))
+            table_file.write(starts.tobytes())
+
+    def override(self, rows):
+        """Replace month starts by (year, month, jdn) rows"""
+        starts = array("i", self.starts)
+        for y, m, jdn in rows:
+            index = self.index(y, m)
+            starts[index] = jdn
+        for index in range(self.months):
+            if not 29 <= starts[index + 1] - starts[index] <= 30:
+                y, m = divmod(index, 12)
+                raise ValueError('Month {0} of {1} would last {2} days.'.format(
+                    m + 1, self.first_year + y, starts[index + 1] - starts[index]))
+        self.starts = starts
+        self._array = None
+
+    def array(self):
+        """The month starts as a NumPy array, for bulk lookups"""
+        if self._array is None:
+            self._array = convert.load_numpy().asarray(self.starts, dtype="int64")
+        return self._array
+
+    def index(self, y, m, following=False):
+        # following allows the month right after the table, whose start is
+        # known but not its length
+        index = (y - self.first_year) * 12 + m - 1
+        if not 0 <= index < self.months + following:
+            raise ValueError('{0}-{1} is outside the Hijri month table ({2} to {3}).'.format(
+                y, m, self.first_year, self.first_year + self.years - 1))
+        return index
+
+    def month_start(self, y, m):
+        return self.starts[self.index(y, m, True)]
+
+    def month_length(self, y, m):
+        index = self.index(y, m)
+        return self.starts[index + 1] - self.starts[index]
+
+    def to_jdn(self, y, m, d, adjust=0):
+        if hasattr(y, "shape"):
+            index = (y - self.first_year) * 12 + m - 1
+            if index.size and (index.min() < 0 or index.max() > self.months):
+                raise ValueError('Dates outside the Hijri month table.')
+            return self.array()[index] + d - 1 + adjust
+        return self.month_start(y, m) + d - 1 + adjust
+
+    def from_jdn(self, jdn, adjust=0):
+        jdn = jdn - adjust
+        if hasattr(jdn, "shape"):
+            starts = self.array()
+            index = convert.numpy.searchsorted(starts, jdn, side="right") - 1
+            if index.size and (index.min() < 0 or index.max() >= self.months):
+                raise ValueError('Dates outside the Hijri month table.')
+        else:
+            starts = self.starts
+            index = bisect_right(starts, jdn) - 1
+            if not 0 <= index < self.months:
+                raise ValueError('JDN {0} is outside the Hijri month table.'.format(jdn))
+        return self.first_year + index // 12, index % 12 + 1, jdn - starts[index] + 1
+
+
+def read_overrides(path):
+    """Read (year, month, jdn) rows from a "year,month,YYYY-MM-DD" CSV file"""
+    rows = []
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        for row in csv.reader(csv_file):
+            if not row or row[0].strip().startswith("#") or not row[0].strip().isdigit():
+                continue
+            gy, gm, gd = (int(part) for part in row[2].strip().split("-"))
+            rows.append((int(row[0]), int(row[1]), convert.gregorian_to_jdn(gy, gm, gd)))
+    return rows
+
+
+def install(table):
+    """Use table (a HijriTable, a file path or None) for every Hijri conversion"""
+    from multicalendar_libs import weeknumbers
+
+    if isinstance(table, str):
+        table = HijriTable.load(table)
+    convert.hijri_table = table
+    weeknumbers.week_one.cache_clear()
+    return table
+
+
+def main(args=None):
+    pars = argparse.ArgumentParser(description="Build or inspect Hijri month tables.")
+    commands = pars.add_subparsers(dest="command")
+    build = commands.add_parser("build", help="Build a table file.")
+    build.add_argument("output")
+    build.add_argument("--first-year", type=int, default=1300)
+    build.add_argument("--last-year", type=int, default=1600)
+    build.add_argument("--overrides", default=None,
+                       help="CSV of published month starts: hijri year,month,YYYY-MM-DD")
+    info = commands.add_parser("info", help="Print the months of a table file.")
+    info.add_argument("table")
+    options = pars.parse_args(args)
+
+    if options.command == "build":
+        table = HijriTable.tabular(options.first_year, options.last_year)
+        if options.overrides:
+            try:
+                table.override(read_overrides(options.overrides))
+            except ValueError as err:
+                sys.stderr.write("{0}\n".format(err))
+                return 1
+        table.save(options.output)
+    elif options.command == "info":
+        table = HijriTable.load(options.table)
+        for index in range(table.months):
+            y, m = table.first_year + index // 12, index % 12 + 1
+            gy, gm, gd = convert.jdn_to_gregorian(table.starts[index])
+            sys.stdout.write("{0}-{1:02d} {2:04d}-{3:02d}-{4:02d} {5}\n".format(
+                y, m, gy, gm, gd, table.month_length(y, m)))
+    else:
+        pars.print_help()
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
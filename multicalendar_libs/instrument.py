@@ -0,0 +1,125 @@
+"""
+Opt-in instrumentation of a calendar run.
+
+With --instrument=FILE (or "-" for the standard error) every phase of the run
+records its wall and CPU time and how much the counters grew meanwhile:
+
+    conversions        dates converted to or from a JDN by the conversion
+                       classes and the bulk functions
+    text_elements      text elements created
+    styles_serialized  style strings serialized
+
+Phases nest, their names are joined with "/" (for example
+"generate/month_3_2024"), and are reported in the order they started, as JSON:
+
+    {"wall_ms": ..., "cpu_ms": ..., "counters": {...},
+     "phases": [{"phase": "validate_options", "wall_ms": ..., "cpu_ms": ...,
+                 "counters": {...}}, ...]}
+
+--profile=FILE also runs the whole session under cProfile and dumps its stats
+for pstats or snakeviz. Nothing is recorded when neither option is given.
+"""
+
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from multicalendar_libs import convert
+
+# The Recorder of the running session, None when instrumentation is off
+current = None
+
+
+class Recorder(object):
+    """Phase timings and counters of one run"""
+
+    def __init__(self, output=None, profile=None):
+        # output is where stop() writes the report, profile the cProfile file
+        self.output = output
+        self.profile = profile
+        self.profiler = None
+        self.counters = Counter()
+        self.phases = []
+        self.stack = []
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+
+    @contextmanager
+    def phase(self, name):
+        self.stack.append(name)
+        entry = {"phase": "/".join(self.stack)}
+        self.phases.append(entry)
+        before = Counter(self.counters)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield entry
+        finally:
+            entry["wall_ms"] = (time.perf_counter() - wall) * 1000
+            entry["cpu_ms"] = (time.process_time() - cpu) * 1000
+            entry["counters"] = dict(self.counters - before)
+            self.stack.pop()
+
+    def report(self):
+        return {
+            "wall_ms": (time.perf_counter() - self.wall) * 1000,
+            "cpu_ms": (time.process_time() - self.cpu) * 1000,
+            "counters": dict(self.counters),
+            "phases": self.phases,
+        }
+
+
+def start(output, profile=None):
+    """Start recording, the report is written to output ("-" is stderr)"""
+    global current
+    stop()
+    current = Recorder(output, profile)
+    convert.counters = current.counters
+    if profile:
+        import cProfile
+        current.profiler = cProfile.Profile()
+        current.profiler.enable()
+    return current
+
+
+def start_for(options):
+    """Start recording if the parsed options ask for it"""
+    if options.instrument or options.profile:
+        start(options.instrument, options.profile)
+
+
+def stop():
+    """Stop recording and write the report and the profile, if any"""
+    global current
+    if current is None:
+        return None
+    import json
+    recorder = current
+    current = None
+    convert.counters = None
+    if recorder.profiler is not None:
+        recorder.profiler.disable()
+        recorder.profiler.dump_stats(recorder.profile)
+    report = recorder.report()
+    if recorder.output == "-":
+        sys.stderr.write(json.dumps(report, indent=2) + "\n")
+    elif recorder.output:
+        with open(recorder.output, "w", encoding="utf-8") as out:
+            json.dump(report, out, indent=2)
+    return report
+
+
+@contextmanager
+def phase(name):
+    """Record the enclosed code as a phase of the running session, if any"""
+    if current is None:
+        yield None
+    else:
+        with current.phase(name) as entry:
+            yield entry
+
+
+def count(name, n=1):
+    if current is not None:
+        current.counters[name] += n
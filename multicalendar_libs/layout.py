@@ -0,0 +1,204 @@
+"""
+Calendar layout model.
+
+This is the pure part of the generator: it decides which day goes in which box
+of which month, without knowing anything about SVG or inkex. The result is a
+tree of immutable namedtuples that a renderer turns into elements, and that can
+also be cached, compared, pickled or benchmarked on its own.
+
+Coordinates are grid positions, not user units: a month sits at (col, row) of
+the year layout and a day at (col, row) of its 7x6 month grid. The week number
+column, when shown, is added by the renderer.
+"""
+
+from collections import namedtuple
+
+from multicalendar_libs import engines, localepacks, monthgrid, weeknumbers
+
+# name is the id of the generated group, title the text shown above it
+YearModel = namedtuple("YearModel", "name year title day_names months")
+MonthModel = namedtuple("MonthModel", "year month col row title secondary_titles weeks")
+# number is 0 when no week number is shown for the row (it holds no day of
+# the month)
+Week = namedtuple("Week", "number cells")
+# secondary is the day number in the other calendar and label the name its
+# engine gives the day (the Javanese pasaran), if any; filler cells belong to
+# the previous or next month; events holds the summaries of the events of the
+# day
+Cell = namedtuple("Cell", "col row day secondary weekend filler label events",
+                  defaults=(None, ()))
+
+
+def weekend_columns(options):
+    """Whether each column of the grid is a weekend day"""
+    days = localepacks.weekend_days(options.weekend)
+    offset = 0 if options.start_day == 'sun' else 1
+    return tuple(localepacks.WEEKDAYS[(pos + offset) % 7] in days for pos in range(7))
+
+
+def day_names(options):
+    """Week day names in column order"""
+    if options.start_day == 'sun':
+        return tuple(options.day_names)
+    return tuple(options.day_names[1:]) + (options.day_names[0],)
+
+
+def primary_engine(options):
+    return engines.engine(options.primary_calendar, options.adjust_hijri_date)
+
+
+def secondary_engine(options):
+    return engines.engine(options.secondary_calendar, options.adjust_hijri_date)
+
+
+def month_name(options, engine, y, m):
+    """The name of month m of year y of engine, localized by the options if they can"""
+    if engine.names_option:
+        return getattr(options, engine.names_option)[m - 1]
+    return engine.month_name(y, m)
+
+
+def secondary_titles(options, grid):
+    """The "name - year" labels of the first two secondary months shown in a month"""
+    engine = secondary_engine(options)
+    return tuple("{0} - {1}".format(month_name(options, engine, year, month), year)
+                 for year, month, _ in grid.secondary_spans()[:2])
+
+
+def row_number(options, scheme, grid, row):
+    """The week number shown for a row of the grid, or 0"""
+    if grid.row_empty(row):
+        return 0
+    return weeknumbers.week_number(scheme, grid.jdn(7 * row), options.adjust_hijri_date)
+
+
+def build_year(options, months_per_line, lazy=False):
+    """
+    Build the model of every month requested by options.
+
+    With lazy the months of the model are an iterator building each month
+    when it is reached.
+    """
+    models = build_months(options, months_per_line, 0, len(month_slots(options)))
+    return YearModel('year_' + str(options.year), options.year, str(options.year),
+                     day_names(options), models if lazy else tuple(models))
+
+
+def month_start(options, y, m):
+    """The JDN of the first day of month m of the primary calendar"""
+    return primary_engine(options).month_start(y, m)
+
+
+def month_of(options, jdn):
+    """The (year, month) of the primary calendar containing the JDN"""
+    engine = primary_engine(options)
+    y, m, _ = engine.from_jdn(jdn)
+    # the tabular Hijri month starts and day conversion can disagree by a
+    # day, the month starts are what the grids are built from
+    if jdn < engine.month_start(y, m):
+        y, m = engine.shift_month(y, m, -1)
+    elif jdn >= engine.month_start(*engine.shift_month(y, m, 1)):
+        y, m = engine.shift_month(y, m, 1)
+    return y, m
+
+
+def range_jdn(options, date):
+    """The JDN of a (y, m, d) date of the range calendar"""
+    calendar = options.range_calendar
+    if calendar == "primary":
+        calendar = options.primary_calendar
+    return engines.engine(calendar, options.adjust_hijri_date).to_jdn(*date)
+
+
+def range_bounds(options):
+    """The first (year, month), the last one and the number of months of the range"""
+    start = range_jdn(options, options.range_start)
+    end = range_jdn(options, options.range_end)
+    if end < start:
+        raise ValueError('The end of the range is before its start.')
+    first = month_of(options, start)
+    last = month_of(options, end)
+    engine = primary_engine(options)
+    return first, last, engine.month_index(*last) - engine.month_index(*first) + 1
+
+
+def build_range(options, months_per_line, lazy=False):
+    """
+    Build the model of every primary calendar month overlapping the range
+    options.range_start to options.range_end.
+
+    The months are the grids of monthgrid.month_grids, so only one chunk of
+    months is converted at a time. With lazy the months of the model are an
+    iterator and only one chunk is held in memory at a time.
+    """
+    first, last, count = range_bounds(options)
+    models = range_months(options, first, count, months_per_line)
+    title = str(first[0]) if first[0] == last[0] else "{0} - {1}".format(first[0], last[0])
+    name = 'range_{0}-{1}_{2}-{3}'.format(first[0], first[1], last[0], last[1])
+    return YearModel(name, first[0], title, day_names(options),
+                     models if lazy else tuple(models))
+
+
+def month_slots(options):
+    """The (year, month) of every month requested by options, in layout order"""
+    if options.range_start:
+        first, _, count = range_bounds(options)
+        engine = primary_engine(options)
+        return [engine.shift_month(first[0], first[1], i) for i in range(count)]
+    if options.month:
+        return [(options.year, options.month)]
+    months = primary_engine(options).months_in_year(options.year)
+    return [(options.year, m) for m in range(1, months + 1)]
+
+
+def event_index(options):
+    """The EventIndex of the events option over every day shown, or None"""
+    if not options.events:
+        return None
+    from multicalendar_libs import convert, events
+
+    slots = month_slots(options)
+    engine = primary_engine(options)
+    # the grids show up to 13 days of the neighbour months
+    first = engine.month_start(*slots[0]) - 14
+    last = engine.month_start(*engine.shift_month(slots[-1][0], slots[-1][1], 1)) + 14
+    return events.load(events.feed_stamps(options.events), first, last,
+                       options.adjust_hijri_date, convert.hijri_table)
+
+
+def build_months(options, months_per_line, index, count):
+    """Generate the models of count months from the slot index on, at their place"""
+    slots = month_slots(options)[index:index + count]
+    return range_months(options, slots[0], len(slots), months_per_line, index)
+
+
+def range_months(options, first, count, months_per_line, index=0):
+    """
+    Generate the models of count months from the (year, month) first, placed
+    from the slot index on
+    """
+    engine = primary_engine(options)
+    secondary = secondary_engine(options)
+    scheme = weeknumbers.scheme_for(options)
+    weekend = weekend_columns(options)
+    first_col = 0 if options.start_day == 'sun' else 1
+    events = event_index(options)
+
+    for slot, grid in enumerate(monthgrid.month_grids(engine, secondary, first, count,
+                                                      first_col), index):
+        weeks = []
+        for w_idx in range(6):
+            cells = []
+            for d_idx in range(7):
+                cell = 7 * w_idx + d_idx
+                filler = grid.filler(cell)
+                if filler and not options.fill_edb:
+                    continue
+                jdn = grid.jdn(cell)
+                cells.append(Cell(d_idx, w_idx, grid.days[cell], grid.secondary_days[cell],
+                                  weekend[d_idx], filler, secondary.day_label(jdn),
+                                  events.events_at(jdn) if events is not None else ()))
+            weeks.append(Week(row_number(options, scheme, grid, w_idx), tuple(cells)))
+        yield MonthModel(grid.year, grid.month, slot % months_per_line, slot // months_per_line,
+                         month_name(options, engine, grid.year, grid.month),
+                         secondary_titles(options, grid), tuple(weeks))
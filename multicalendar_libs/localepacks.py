@@ -0,0 +1,143 @@
+"""
+Locale packs: the names, digits and weekend of a language in one data file.
+
+A pack is a JSON object in multicalendar_libs/locales (or any file given by
+its path) with the keys:
+
+    month-names        the 12 Gregorian month names
+    hijri-month-names  the 12 Hijri month names
+    day-names          the 7 week day names, from Sunday
+    weeknr-name        the title of the week number column
+    digits             a name of DIGIT_SETS or the 10 digits themselves
+    weekend            the weekend days, as the weekend option ("fri+sat")
+
+Parsed and validated packs are stored with marshal in the user cache
+directory, next to the fragment cache, and only parsed again when their file
+changes. A process loads every pack at most once.
+"""
+
+import marshal
+import os
+from functools import lru_cache
+
+from multicalendar_libs.arguments import cache_directory
+
+# Bump when the stored form of a pack changes
+CACHE_VERSION = 1
+LOCALES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+
+DIGIT_SETS = {
+    "latin": "0123456789",
+    "arabic-indic": "٠١٢٣٤٥٦٧٨٩",
+    "persian": "۰۱۲۳۴۵۶۷۸۹",
+    "devanagari": "०१२३४५६७८९",
+    "thai": "๐๑๒๓๔๕๖๗๘๙",
+    "bengali": "০১২৩৪৫৬৭৮৯",
+}
+WEEKDAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")
+
+
+def digit_set(value):
+    """The 10 digits of a DIGIT_SETS name, or of a string of 10 digits"""
+    if value in DIGIT_SETS:
+        return DIGIT_SETS[value]
+    if len(value) == 10:
+        return value
+    raise ValueError('Unknown digits "{0}", use one of {1} or 10 characters.'.format(
+        value, ", ".join(sorted(DIGIT_SETS))))
+
+
+def weekend_days(value):
+    """The week day names of a weekend option such as "sat+sun" """
+    days = tuple(value.split("+"))
+    for day in days:
+        if day not in WEEKDAYS:
+            raise ValueError('Unknown weekend day "{0}", use {1} joined by "+".'.format(
+                day, ", ".join(WEEKDAYS)))
+    return days
+
+
+def available():
+    """The names of the packs shipped with the extension"""
+    return sorted(name[:-5] for name in os.listdir(LOCALES_DIRECTORY)
+                  if name.endswith(".json"))
+
+
+def pack_path(name):
+    """The file of a pack given by name or by path"""
+    if os.sep in name or name.endswith(".json"):
+        return os.path.abspath(name)
+    return os.path.join(LOCALES_DIRECTORY, name + ".json")
+
+
+def parse(path):
+    """Read and validate the pack at path"""
+    import json
+    try:
+        with open(path, encoding="utf-8") as source:
+            data = json.load(source)
+    except OSError:
+        raise ValueError('Unknown locale "{0}", the packs are {1}.'.format(
+            os.path.basename(path)[:-5] if path.endswith(".json") else path,
+            ", ".join(available())))
+    except ValueError as err:
+        raise ValueError('Invalid locale pack {0}: {1}'.format(path, err))
+    pack = {}
+    for key, length in (("month-names", 12), ("hijri-month-names", 12), ("day-names", 7)):
+        names = data.get(key)
+        if not isinstance(names, list) or len(names) != length:
+            raise ValueError('The locale pack {0} needs {1} "{2}".'.format(path, length, key))
+        pack[key] = [str(name) for name in names]
+    pack["weeknr-name"] = str(data.get("weeknr-name", "Wk"))
+    pack["digits"] = digit_set(data.get("digits", "latin"))
+    pack["weekend"] = "+".join(weekend_days(data.get("weekend", "sat+sun")))
+    return pack
+
+
+def compiled_path(path):
+    import hashlib
+    key = hashlib.sha256(path.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(cache_directory("locales"), key + ".marshal")
+
+
+@lru_cache(maxsize=None)
+def load(name):
+    """The pack of a name or path, from the compiled cache when it is up to date"""
+    path = pack_path(name)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return parse(path)
+    stamp = (CACHE_VERSION, path, stat.st_mtime_ns, stat.st_size)
+    compiled = compiled_path(path)
+    try:
+        with open(compiled, "rb") as cached:
+            stored_stamp, pack = marshal.load(cached)
+        if stored_stamp == stamp:
+            return pack
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    pack = parse(path)
+    import tempfile
+    try:
+        os.makedirs(os.path.dirname(compiled), exist_ok=True)
+        # write aside and rename, so a concurrent run never reads half a file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(compiled), suffix=".tmp")
+        with os.fdopen(fd, "wb") as cached:
+            marshal.dump((stamp, pack), cached)
+        os.replace(tmp, compiled)
+    except OSError:
+        pass  # a read-only cache only costs the parsing
+    return pack
+
+
+def apply(options, pack):
+    """Set the names of a pack on the options, and its digits and weekend when "auto" """
+    options.month_names = list(pack["month-names"])
+    options.hijri_month_names = list(pack["hijri-month-names"])
+    options.day_names = list(pack["day-names"])
+    options.weeknr_name = pack["weeknr-name"]
+    if options.digits == "auto":
+        options.digits = pack["digits"]
+    if options.weekend == "auto":
+        options.weekend = pack["weekend"]
@@ -0,0 +1,110 @@
+"""
+Compact month grids shared by every layout of the calendar generator.
+
+A MonthGrid is a month of the primary calendar on 6 rows of 7 day boxes.
+Its 42 cells are consecutive days, so a cell is only an index: cell i is at
+row i // 7 and column i % 7 and its JDN is start + i. The first and last
+fields are the cells of the first and last day of the month, every other
+cell is a filler day of a neighbour month. The day numbers and secondary
+dates of all the cells are stored in flat arrays, so filling the empty boxes,
+finding the secondary months shown and flattening a month are index
+arithmetic on one grid instead of building its neighbours.
+
+month_grids builds consecutive grids from a single stream of JDNs,
+converting CHUNK months at a time with the bulk engine methods.
+"""
+
+from array import array
+from math import ceil
+
+# Months converted at once by month_grids
+CHUNK = 12
+CELLS = 42
+
+
+class MonthGrid(object):
+    """
+    Month (year, month) of the primary calendar on 6x7 cells from the JDN start.
+
+    days holds the primary day numbers of the cells and secondary_years,
+    secondary_months and secondary_days their secondary dates.
+    """
+    __slots__ = ("year", "month", "start", "first", "last", "days",
+                 "secondary_years", "secondary_months", "secondary_days")
+
+    def __init__(self, year, month, start, first, last, days,
+                 secondary_years, secondary_months, secondary_days):
+        self.year = year
+        self.month = month
+        self.start = start
+        self.first = first
+        self.last = last
+        self.days = days
+        self.secondary_years = secondary_years
+        self.secondary_months = secondary_months
+        self.secondary_days = secondary_days
+
+    def jdn(self, index):
+        return self.start + index
+
+    def filler(self, index):
+        """Whether the cell holds a day of a neighbour month"""
+        return not self.first <= index <= self.last
+
+    def row_empty(self, row):
+        """Whether the row holds no day of the month"""
+        return 7 * row + 6 < self.first or 7 * row > self.last
+
+    def month_days(self):
+        """The day numbers of the month, without the fillers"""
+        return self.days[self.first:self.last + 1]
+
+    def secondary_spans(self):
+        """The (year, month, first cell) of the secondary months the month days fall in"""
+        months = self.secondary_months
+        spans = [(self.secondary_years[self.first], months[self.first], self.first)]
+        for index in range(self.first + 1, self.last + 1):
+            if months[index] != months[index - 1]:
+                spans.append((self.secondary_years[index], months[index], index))
+        return spans
+
+
+def month_grids(primary, secondary, first, count, first_col):
+    """
+    Generate the grids of count months of the primary engine from the
+    (year, month) first on, with secondary dates from the secondary engine.
+
+    first_col is 0 when the rows start on Sunday, 1 on Monday.
+    """
+    # starts of the month before the first one up to two months after the last
+    starts = [primary.month_start(*primary.shift_month(first[0], first[1], delta))
+              for delta in range(-1, count + 2)]
+    geometry = []
+    for i in range(count):
+        begin, n_days = starts[i + 1], starts[i + 2] - starts[i + 1]
+        lead = (begin + 1 - first_col) % 7
+        # months spanning 4 rows get an empty row above (Feb 2009)
+        top = 1 if ceil((lead + n_days) / 7.0) == 4 else 0
+        geometry.append((begin - lead - 7 * top, lead + 7 * top, n_days))
+
+    for chunk in range(0, count, CHUNK):
+        end = min(chunk + CHUNK, count)
+        low = geometry[chunk][0]
+        high = geometry[end - 1][0] + CELLS
+        # the primary day numbers and the secondary dates of the chunk
+        days = array("B")
+        for k in range(chunk, end + 2):
+            days.extend(range(max(low, starts[k]) - starts[k] + 1,
+                              min(high, starts[k + 1]) - starts[k] + 1))
+        dates = secondary.from_jdn_bulk(range(low, high))
+        if not isinstance(dates, list):
+            dates = dates.tolist()
+        years, months, month_days = zip(*dates)
+
+        for i in range(chunk, end):
+            start, offset, n_days = geometry[i]
+            y, m = primary.shift_month(first[0], first[1], i)
+            cells = slice(start - low, start - low + CELLS)
+            yield MonthGrid(y, m, start, offset, offset + n_days - 1, days[cells],
+                            array("l", years[cells]), array("B", months[cells]),
+                            array("B", month_days[cells]))
@@ -0,0 +1,75 @@
+"""
+Parallel rendering of the months of a calendar.
+
+Every month model already carries its position and week numbers, so months
+can be rendered independently. render_months sends the sizes and styles of a
+CalendarRenderer to worker processes once, renders the month groups there with
+the lightweight svgwriter elements and returns their markup in month order,
+for the renderer to merge into its year group. Workers never import inkex.
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from multicalendar_libs import svgwriter
+from multicalendar_libs.render import CalendarRenderer
+
+# CalendarRenderer attributes create_month depends on
+MONTH_STATE = ("options", "doc_w", "doc_h", "cols_before", "months_per_line",
+               "month_w", "month_margin", "day_w", "day_h", "month_h", "year_margin",
+               "cell_x", "cell_y", "secondary_x", "secondary_y",
+               "styles", "class_prefix", "style_atts")
+
+# Option values that can be sent to the workers, leaving out the input and
+# output streams of inkex
+OPTION_TYPES = (str, int, float, bool, list, tuple, type(None))
+
+_renderer = None
+
+
+class FragmentRenderer(CalendarRenderer):
+    """Renders single months of another renderer to markup"""
+    elements = svgwriter
+
+    def __init__(self, state):
+        self.__dict__.update(state)
+
+    def render(self, month, day_names):
+        self.year_g = svgwriter.Group()
+        self.create_month(month, day_names)
+        return self.year_g.children[0].tostring()
+
+
+def _init_worker(state):
+    global _renderer
+    _renderer = FragmentRenderer(state)
+
+
+def _render_month(month, day_names):
+    return _renderer.render(month, day_names)
+
+
+def workers_for(options):
+    """The number of worker processes of the workers option, 0 is one per CPU"""
+    return options.workers or os.cpu_count() or 1
+
+
+def renderer_state(renderer):
+    """The picklable state a FragmentRenderer needs to render the months of renderer"""
+    state = dict((name, getattr(renderer, name)) for name in MONTH_STATE)
+    state["options"] = argparse.Namespace(**dict(
+        (key, value) for key, value in vars(renderer.options).items()
+        if isinstance(value, OPTION_TYPES)))
+    return state
+
+
+def render_months(renderer, months, day_names, workers):
+    """The markup of the month groups of renderer, rendered on workers processes"""
+    state = renderer_state(renderer)
+    workers = min(workers, len(months))
+    chunksize = max(1, len(months) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(state,)) as executor:
+        return list(executor.map(_render_month, months, [day_names] * len(months),
+                                 chunksize=chunksize))
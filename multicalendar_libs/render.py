@@ -0,0 +1,332 @@
+"""
+SVG rendering of the calendar layout model.
+
+CalendarRenderer turns the model built by multicalendar_libs.layout into text
+elements. It does not import inkex itself: subclasses set ``elements`` to a
+module providing the element classes and Style (inkex, or the lightweight
+multicalendar_libs.svgwriter) and implement ``unittouu``.
+"""
+
+import sys
+from functools import lru_cache
+
+from multicalendar_libs import instrument, layout
+
+if sys.version_info[0] > 2:
+    def unicode(s, encoding):
+        if isinstance(s, bytes):
+            return s.decode(encoding)
+        return s
+    def to_farsi(s):
+        return s.translate(FARSI_DIGITS)
+
+FARSI_NUMBER = "٠١٢٣٤٥٦٧٨٩"
+FARSI_DIGITS = str.maketrans("0123456789", FARSI_NUMBER)
+
+# Interned day and week numbers in each numeral system, indexed by number
+LATIN_NUMBERS = tuple(sys.intern(str(n)) for n in range(60))
+
+
+@lru_cache(maxsize=16)
+def number_table(digits):
+    """LATIN_NUMBERS written with the 10 digits of a numeral system"""
+    table = str.maketrans("0123456789", digits)
+    return tuple(sys.intern(n.translate(table)) for n in LATIN_NUMBERS)
+
+
+class CalendarRenderer(object):
+    """Render the calendar for the parsed and validated self.options"""
+    elements = None
+
+    def unittouu(self, value):
+        raise NotImplementedError
+
+    def add_fragment(self, parent, markup):
+        """Append the elements serialized in markup to parent"""
+        raise NotImplementedError
+
+    def calculate_size_and_positions(self):
+        # month_margin month_width months_per_line auto_organize
+        self.doc_w = self.unittouu(self.document.getroot().get('width'))
+        self.doc_h = self.unittouu(self.document.getroot().get('height'))
+        if self.options.show_weeknr:
+            self.cols_before = 1
+        else:
+            self.cols_before = 0
+        if self.options.auto_organize:
+            if self.doc_h > self.doc_w:
+                self.months_per_line = 3
+            else:
+                self.months_per_line = 4
+        else:
+            self.months_per_line = self.options.months_per_line
+        # self.month_w = self.doc_w / self.months_per_line
+        if self.options.auto_organize:
+            self.month_w = (self.doc_w * 0.8) / self.months_per_line
+            self.month_margin = self.month_w / 10
+        else:
+            self.month_w = self.options.month_width
+            self.month_margin = self.options.month_margin
+        self.day_w = self.month_w / (7 + self.cols_before)
+        self.day_h = self.month_w / 9
+        self.month_h = self.day_w * 7
+        # Text coordinates of the 8 columns and 6 rows of a month grid, and of
+        # the secondary dates drawn next to them
+        self.cell_x = [str(self.day_w * x) for x in range(8)]
+        self.cell_y = [str(self.day_h * (y + 2)) for y in range(6)]
+        self.secondary_x = [str((self.day_w * x) + 2) for x in range(8)]
+        self.secondary_y = [str((self.day_h * (y + 2)) + 2) for y in range(6)]
+        if self.options.month == 0:
+            self.year_margin = ((self.doc_w + self.day_w -
+                                 (self.month_w * self.months_per_line) -
+                                 (self.month_margin *
+                                  (self.months_per_line - 1))) / 2)  # - self.month_margin
+        else:
+            self.year_margin = (self.doc_w - self.month_w) / 2
+        self.style_day = {
+            'font-size': str(self.day_w / 2),
+            'font-family': self.options.font_day,
+            'text-anchor': 'middle',
+            'text-align': 'center',
+            'fill': self.options.color_day
+        }
+        self.style_weekend = self.style_day.copy()
+        self.style_weekend['fill'] = self.options.color_weekend
+        self.style_day_hijri = self.style_day.copy()
+        self.style_day_hijri["font-size"] = str(self.day_w / 4)
+        self.style_day_hijri["fill"] = self.options.color_day_hijri
+        self.style_day_hijri["text-anchor"] = 'middle'
+        self.style_day_hijri["text-align"] = 'center'
+        self.style_weekend_hijri = self.style_day_hijri.copy()
+        self.style_weekend_hijri['fill'] = self.options.color_weekend_hijri
+        self.style_nmd = self.style_day.copy()
+        self.style_nmd['fill'] = self.options.color_nmd
+        self.style_event = self.style_day.copy()
+        self.style_event['fill'] = self.options.color_event
+        self.style_event['font-weight'] = 'bold'
+        self.style_month = self.style_day.copy()
+        self.style_month['fill'] = self.options.color_month
+        self.style_month["text-anchor"] = 'inherit'
+        self.style_month["text-align"] = None
+        self.style_month['font-family'] = self.options.font_month
+        self.style_month['font-size'] = str(self.day_w / 1.5)
+        self.style_month['font-weight'] = 'bold'
+        self.style_month_secondary = self.style_day_hijri.copy()
+        self.style_month_secondary['fill'] = self.options.color_month
+        self.style_month_secondary["text-anchor"] = 'end'
+        self.style_month_secondary["text-align"] = 'end'
+        self.style_day_name = self.style_day.copy()
+        self.style_day_name['fill'] = self.options.color_day_name
+        self.style_day_name['font-family'] = self.options.font_day_name
+        self.style_day_name['font-size'] = str(self.day_w / 3)
+        self.style_year = self.style_day.copy()
+        self.style_year['fill'] = self.options.color_year
+        self.style_year['font-family'] = self.options.font_year
+        self.style_year['font-size'] = str(self.day_w * 2)
+        self.style_year['font-weight'] = 'bold'
+        self.style_weeknr = self.style_day.copy()
+        self.style_weeknr['fill'] = self.options.color_weeknr
+        self.style_weeknr['font-size'] = str(self.day_w / 3)
+        self.styles = {
+            'year': self.style_year,
+            'month': self.style_month,
+            'month-secondary': self.style_month_secondary,
+            'day-name': self.style_day_name,
+            'day': self.style_day,
+            'weekend': self.style_weekend,
+            'nmd': self.style_nmd,
+            'event': self.style_event,
+            'hijri': self.style_day_hijri,
+            'weekend-hijri': self.style_weekend_hijri,
+            'weeknr': self.style_weeknr,
+        }
+        # Serialize every style once, cells only pick the prepared attribute
+        self.class_prefix = 'mc{0}-'.format(self.options.year)
+        self.style_atts = {}
+        for name, style in self.styles.items():
+            if self.options.style_mode == 'class':
+                self.style_atts[name] = {'class': self.class_prefix + name}
+            else:
+                self.style_atts[name] = {'style': str(self.elements.Style(style))}
+                instrument.count("styles_serialized")
+
+    def write_stylesheet(self, parent):
+        """Add the style element defining the classes of the class style mode"""
+        css = "\n".join(
+            ".{0}{1}{{{2}}}".format(self.class_prefix, name, self.elements.Style(
+                (key, value) for key, value in style.items() if value is not None))
+            for name, style in self.styles.items())
+        style_element = parent.add(self.elements.StyleElement(type='text/css'))
+        style_element.text = css
+        instrument.count("styles_serialized", len(self.styles))
+
+    def count_text_elements(self, parent):
+        if instrument.current is not None:
+            instrument.count("text_elements", sum(
+                1 for element in parent.iter() if isinstance(element, self.elements.TextElement)))
+
+    def write_month_header(self, g, month, day_names):
+        txt_atts = dict(self.style_atts['month'],
+                        x=str(-self.day_w / 3),
+                        y=str(self.day_h / 5))
+        try:
+            g.add(self.elements.TextElement(**txt_atts)).text = unicode(month.title, self.options.input_encode)
+        except:
+            raise ValueError('You must select a correct system encoding.')
+
+        if self.options.use_symbols:
+            use = g.add(self.elements.Use())
+            use.set('xlink:href', '#' + self.class_prefix + 'weekdays')
+        else:
+            self.write_day_names(g.add(self.elements.Group()), day_names)
+
+    def write_day_names(self, gw, day_names):
+        week_x = 0
+        day_names = list(day_names)
+        if self.options.show_weeknr:
+            day_names.insert(0, self.options.weeknr_name)
+
+        for wday in day_names:
+            txt_atts = dict(self.style_atts['day-name'],
+                            x=str(self.day_w * week_x),
+                            y=str(self.day_h))
+            try:
+                gw.add(self.elements.TextElement(**txt_atts)).text = unicode(
+                    wday, self.options.input_encode)
+            except:
+                raise ValueError('You must select a correct system encoding.')
+
+            week_x += 1
+
+    def write_symbols(self, parent, day_names):
+        """Define the fragments repeated in every month once, for <use> references"""
+        defs = parent.add(self.elements.Defs())
+        symbol = defs.add(self.elements.Symbol(id=self.class_prefix + 'weekdays',
+                                               style='overflow:visible'))
+        self.write_day_names(symbol, day_names)
+        self.count_text_elements(symbol)
+
+    def write_month_header_secondary(self, g, month):
+        txt_atts = dict(self.style_atts['month-secondary'],
+                        x=str((self.month_w - (self.day_w / 1.5))),
+                        y="-1.5")
+        for title in month.secondary_titles:
+            try:
+                g.add(self.elements.TextElement(**txt_atts)).text = unicode(title, self.options.input_encode)
+            except:
+                raise ValueError(month.secondary_titles)
+            txt_atts["y"] = "1.5"
+
+    def create_month(self, month, day_names):
+        txt_atts = {
+            'transform': 'translate(' +
+                         str(self.year_margin +
+                             (self.month_w + self.month_margin) *
+                             month.col) +
+                         ',' +
+                         str((self.day_h * 4) +
+                             (self.month_h * month.row)) +
+                         ')',
+            'id': 'month_' +
+                  str(month.month) +
+                  '_' +
+                  str(month.year)}
+        g = self.year_g.add(self.elements.Group(**txt_atts))
+        self.write_month_header(g, month, day_names)
+        gdays = g.add(self.elements.Group())
+        gdays_secondary = g.add(self.elements.Group())
+
+        if self.options.enable_secondary_date:
+            gmonths_secondary = g.add(self.elements.Group())
+            self.write_month_header_secondary(gmonths_secondary, month)
+
+        digits = number_table(self.options.digits)
+        numbers = LATIN_NUMBERS if self.options.use_farsi_day == "second" else digits
+        numbers_secondary = LATIN_NUMBERS if self.options.use_farsi_day == "primer" else digits
+        for week_y, week in enumerate(month.weeks):
+            y = self.cell_y[week_y]
+            if self.options.show_weeknr and week.number:
+                txt_atts = dict(self.style_atts['weeknr'], x=self.cell_x[0], y=y)
+                gdays.add(self.elements.TextElement(**txt_atts)).text = LATIN_NUMBERS[week.number]
+            for cell in week.cells:
+                week_x = cell.col + self.cols_before
+                style = 'day'
+                style_hijri = 'hijri'
+                if cell.weekend:
+                    style = 'weekend'
+                    style_hijri = 'weekend-hijri'
+                if cell.filler:
+                    style = 'nmd'
+                elif cell.events:
+                    style = 'event'
+                txt_atts = dict(self.style_atts[style], x=self.cell_x[week_x], y=y)
+                day = gdays.add(self.elements.TextElement(**txt_atts))
+                day.text = numbers[cell.day]
+                if cell.events:
+                    # the summaries show as the tooltip of the day
+                    day.add(self.elements.Title()).text = "\n".join(cell.events)
+                if self.options.enable_secondary_date:
+                    txt_atts_hijri = dict(self.style_atts[style_hijri],
+                                          x=self.secondary_x[week_x],
+                                          y=self.secondary_y[week_y])
+                    text = numbers_secondary[cell.secondary]
+                    if cell.label:
+                        text = text + " " + cell.label
+                    gdays_secondary.add(self.elements.TextElement(**txt_atts_hijri)).text = text
+        self.count_text_elements(g)
+
+    def build_model(self, lazy=False):
+        with instrument.phase("layout"):
+            if self.options.range_start:
+                return layout.build_range(self.options, self.months_per_line, lazy)
+            return layout.build_year(self.options, self.months_per_line, lazy)
+
+    def write_year_header(self, parent, model):
+        """Add the year group with everything but its months to parent"""
+        txt_atts = {'id': model.name}
+        self.year_g = parent.add(self.elements.Group(**txt_atts))
+        if self.options.style_mode == 'class':
+            self.write_stylesheet(self.year_g)
+        txt_atts = dict(self.style_atts['year'],
+                        x=str(self.doc_w / 2),
+                        y=str(self.day_w * 1.5))
+        self.year_g.add(self.elements.TextElement(**txt_atts)).text = model.title
+        instrument.count("text_elements")
+        if self.options.use_symbols:
+            self.write_symbols(self.year_g, model.day_names)
+        return self.year_g
+
+    def generate(self, parent):
+        """Render the calendar requested by the options under parent"""
+        with instrument.phase("generate"):
+            with instrument.phase("calculate_size_and_positions"):
+                self.calculate_size_and_positions()
+            if self.options.fragment_cache:
+                self.generate_cached(parent)
+                return
+            model = self.build_model()
+            self.write_year_header(parent, model)
+            if self.options.workers != 1 and len(model.months) > 1:
+                from multicalendar_libs import parallel
+
+                with instrument.phase("months"):
+                    for markup in parallel.render_months(self, model.months, model.day_names,
+                                                         parallel.workers_for(self.options)):
+                        self.add_fragment(self.year_g, markup)
+                return
+            for month in model.months:
+                with instrument.phase("month_{0}_{1}".format(month.month, month.year)):
+                    self.create_month(month, model.day_names)
+
+    def generate_cached(self, parent):
+        """Render the months through the on-disk fragment cache"""
+        from multicalendar_libs import fragmentcache
+
+        # the months of a lazy model are only built for the cache misses
+        model = self.build_model(lazy=True)
+        self.write_year_header(parent, model)
+        cache = fragmentcache.FragmentCache(self.options.fragment_cache_dir,
+                                            self.options.fragment_cache_size * 1024 * 1024)
+        with instrument.phase("months"):
+            for markup in fragmentcache.render_months(self, model.day_names, cache):
+                self.add_fragment(self.year_g, markup)
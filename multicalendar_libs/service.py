@@ -0,0 +1,242 @@
+"""
+Local calendar rendering service.
+
+A long running asyncio HTTP server rendering calendars with the headless
+generator on a pool of worker processes that stay warm between requests:
+
+    python -m multicalendar_libs.service --port=8150 --workers=4
+
+POST /render takes the options of the extension as a JSON object, named
+without their leading dashes as in the batch job files, and returns the SVG:
+
+    curl -d '{"year": 2025, "enable-secondary-date": true}' localhost:8150/render
+
+Responses are kept in an in-memory LRU cache, bounded in bytes, keyed on the
+normalized options (all the parsed values, defaults included, so requests
+spelling out a default share their entry). The X-Cache header tells whether
+a response was a "hit" or a "miss". Identical requests arriving while one is
+rendered wait for that render. Renders run on the workers, so the server
+keeps answering cache hits and other requests meanwhile. GET /stats returns
+the cache counters as JSON.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stderr
+
+from multicalendar_libs.batch import option_args
+
+# Options that do not change the SVG or cannot be honoured by the service
+IGNORED_OPTIONS = ("tab", "output", "stream", "instrument", "profile", "workers",
+                   "fragment_cache", "fragment_cache_dir", "fragment_cache_size")
+MAX_BODY = 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ResponseCache(object):
+    """Rendered documents by key, the least recently used dropped past max_bytes"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        body = self.entries.get(key)
+        if body is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def put(self, key, body):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes and self.entries:
+            self.size -= len(self.entries.popitem(last=False)[1])
+
+    def stats(self):
+        return {"entries": len(self.entries), "bytes": self.size,
+                "hits": self.hits, "misses": self.misses}
+
+
+def render_svg(args):
+    """The SVG of a command line, rendered in a worker process"""
+    from multicalendar_libs.headless import HeadlessCalendar
+
+    calendar = HeadlessCalendar()
+    calendar.errormsg = lambda msg: None
+    stderr = io.StringIO()
+    try:
+        with redirect_stderr(stderr):
+            calendar.parse_arguments(args)
+    except SystemExit:
+        # argparse rejected the options and explained why on stderr
+        raise ValueError(stderr.getvalue().strip().split("\n")[-1])
+    calendar.generate(calendar.document.getroot())
+    out = io.StringIO()
+    calendar.document.write(out)
+    return out.getvalue().encode("utf-8")
+
+
+class CalendarService(object):
+    """Renders option objects to SVG, from the cache or on the worker processes"""
+
+    def __init__(self, workers=None, cache_bytes=64 * 1024 * 1024):
+        from multicalendar_libs.headless import HeadlessCalendar
+
+        self.parser = HeadlessCalendar().arg_parser
+        self.cache = ResponseCache(cache_bytes)
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.pending = {}
+
+    def normalize(self, options):
+        """The cache key and the command line of a JSON option object"""
+        if not isinstance(options, dict):
+            raise ValueError("The options must be a JSON object.")
+        options = dict((key, value) for key, value in options.items()
+                       if key.replace("-", "_") not in IGNORED_OPTIONS)
+        args = option_args(options)
+        stderr = io.StringIO()
+        try:
+            with redirect_stderr(stderr):
+                parsed = self.parser.parse_args(args)
+        except SystemExit:
+            raise ValueError(stderr.getvalue().strip().split("\n")[-1])
+        values = dict((key, value) for key, value in vars(parsed).items()
+                      if key not in IGNORED_OPTIONS)
+        if values.get("events"):
+            # an edited feed must not be answered from the cache
+            from multicalendar_libs.events import feed_stamps
+            values["events"] = feed_stamps(values["events"])
+        key = hashlib.sha256(json.dumps(values, sort_keys=True).encode("utf-8")).hexdigest()
+        return key, args + ["--workers=1"]
+
+    async def render(self, options):
+        """(svg, hit) for a JSON option object"""
+        key, args = self.normalize(options)
+        body = self.cache.get(key)
+        if body is not None:
+            return body, True
+        if key not in self.pending:
+            loop = asyncio.get_running_loop()
+            self.pending[key] = loop.run_in_executor(self.executor, render_svg, args)
+        future = self.pending[key]
+        try:
+            body = await asyncio.shield(future)
+        finally:
+            if future.done():
+                self.pending.pop(key, None)
+        self.cache.put(key, body)
+        return body, False
+
+    async def warm(self, workers):
+        """Start the workers and render a month on each, importing everything"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.executor, render_svg,
+                                                    ["--year=2000", "--month=1"])
+                               for _ in range(workers)])
+
+    async def respond(self, method, path, body):
+        """(status, content type, extra headers, body) of a request"""
+        if path == "/render":
+            if method != "POST":
+                return 405, "text/plain", {}, b"Use POST.\n"
+            try:
+                svg, hit = await self.render(json.loads(body.decode("utf-8") or "{}"))
+            except ValueError as err:
+                return 400, "text/plain", {}, (str(err) + "\n").encode("utf-8")
+            except Exception as err:
+                message = "{0}: {1}\n".format(type(err).__name__, err)
+                return 500, "text/plain", {}, message.encode("utf-8")
+            return 200, "image/svg+xml", {"X-Cache": "hit" if hit else "miss"}, svg
+        if path == "/stats":
+            stats = dict(self.cache.stats(), pending=len(self.pending))
+            return 200, "application/json", {}, json.dumps(stats).encode("utf-8")
+        return 404, "text/plain", {}, b"Not found.\n"
+
+    async def handle(self, reader, writer):
+        """Serve the HTTP/1.1 requests of a connection"""
+        try:
+            while True:
+                request = await reader.readline()
+                if not request.strip():
+                    break
+                method, path = request.decode("latin-1").split()[:2]
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, content_type, extra, body = 413, "text/plain", {}, b"Too large.\n"
+                    headers["connection"] = "close"
+                else:
+                    data = await reader.readexactly(length)
+                    status, content_type, extra, body = await self.respond(
+                        method, path.split("?")[0], data)
+                close = headers.get("connection", "").lower() == "close"
+                head = ["HTTP/1.1 {0} {1}".format(status, REASONS[status]),
+                        "Content-Type: " + content_type,
+                        "Content-Length: {0}".format(len(body))]
+                head.extend("{0}: {1}".format(name, value) for name, value in extra.items())
+                if close:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if close:
+                    break
+        except (ValueError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port, workers):
+        server = await asyncio.start_server(self.handle, host, port)
+        await self.warm(workers)
+        sys.stderr.write("Serving calendars on http://{0}:{1}/render\n".format(host, port))
+        async with server:
+            await server.serve_forever()
+
+
+def main(args=None):
+    import os
+
+    pars = argparse.ArgumentParser(description="Serve calendar renders over local HTTP.")
+    pars.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    pars.add_argument("--port", type=int, default=8150, help="Port to listen on.")
+    pars.add_argument("--workers", type=int, default=None,
+                      help="Number of worker processes (default: number of CPUs).")
+    pars.add_argument("--cache-size", type=int, default=64,
+                      help="Size limit of the response cache in MiB.")
+    options = pars.parse_args(args)
+
+    workers = options.workers or os.cpu_count() or 1
+    service = CalendarService(workers, options.cache_size * 1024 * 1024)
+    try:
+        asyncio.run(service.serve(options.host, options.port, workers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.executor.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+A small SVG element tree for generating documents without inkex and lxml.
+
+It provides the subset of the inkex element API used by CalendarRenderer:
+Group, TextElement, StyleElement, Defs, Symbol and Use built from keyword
+attributes, ``add``, ``get``, ``set`` and ``text``, plus Style for serializing
+style dictionaries.
+"""
+
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+
+
+def escape(text):
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def quoteattr(text):
+    return '"' + escape(text).replace('"', "&quot;") + '"'
+
+
+class Style(dict):
+    """A style dictionary serialized as "name:value;name:value" """
+    def __str__(self):
+        return ";".join("{0}:{1}".format(key, value)
+                        for key, value in sorted(self.items())
+                        if value is not None)
+
+
+class Element(object):
+    tag = None
+
+    def __init__(self, **attrib):
+        self.attrib = dict(attrib)
+        self.children = []
+        self.text = None
+
+    def get(self, key, default=None):
+        return self.attrib.get(key, default)
+
+    def set(self, key, value):
+        self.attrib[key] = value
+
+    def add(self, *children):
+        self.children.extend(children)
+        return children[-1] if children else None
+
+    def append(self, child):
+        self.children.append(child)
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def iter(self):
+        """The element and all its descendants in document order, like lxml"""
+        yield self
+        for child in self.children:
+            for element in child.iter():
+                yield element
+
+    def start_tag(self):
+        attrs = "".join(" {0}={1}".format(key, quoteattr(str(value)))
+                        for key, value in self.attrib.items())
+        return "<{0}{1}>".format(self.tag, attrs)
+
+    def end_tag(self):
+        return "</{0}>".format(self.tag)
+
+    def write(self, out):
+        """Write the element and its children to the text stream out"""
+        out.write(self.start_tag())
+        if self.text is not None:
+            out.write(escape(str(self.text)))
+        for child in self.children:
+            child.write(out)
+        out.write(self.end_tag())
+
+    def tostring(self):
+        chunks = []
+        self.write(_ChunkWriter(chunks))
+        return "".join(chunks)
+
+
+class _ChunkWriter(object):
+    def __init__(self, chunks):
+        self.write = chunks.append
+
+
+class Group(Element):
+    tag = "g"
+
+
+class TextElement(Element):
+    tag = "text"
+
+
+class Title(Element):
+    tag = "title"
+
+
+class StyleElement(Element):
+    tag = "style"
+
+
+class Defs(Element):
+    tag = "defs"
+
+
+class Symbol(Element):
+    tag = "symbol"
+
+
+class Use(Element):
+    tag = "use"
+
+
+class Fragment(Element):
+    """Already serialized markup, written as is"""
+    def __init__(self, markup):
+        Element.__init__(self)
+        self.markup = markup
+
+    def write(self, out):
+        out.write(self.markup)
+
+
+class SvgDocumentElement(Element):
+    tag = "svg"
+
+    def __init__(self, width, height, viewbox, **attrib):
+        Element.__init__(self, xmlns=SVG_NS, width=width, height=height,
+                         viewBox=viewbox, **attrib)
+        self.attrib["xmlns:xlink"] = XLINK_NS
+
+
+class Document(object):
+    """An SVG document of the given size, with one user unit per size unit"""
+    def __init__(self, width, height, unit):
+        self.unit = unit
+        self.root = SvgDocumentElement(
+            "{0:g}{1}".format(width, unit), "{0:g}{1}".format(height, unit),
+            "0 0 {0:g} {1:g}".format(width, height))
+
+    def getroot(self):
+        return self.root
+
+    def write(self, out):
+        out.write(XML_DECLARATION)
+        self.root.write(out)
+        out.write("\n")
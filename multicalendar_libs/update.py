@@ -0,0 +1,126 @@
+"""
+In-place update of a calendar already in a document.
+
+The extension stores the arguments of every run on the group it generates.
+Running it again in update mode renders both the calendar of those previous
+arguments and the requested one, and only applies their differences to the
+group found in the document: changed attributes and texts are rewritten,
+everything the generator did not change is left alone, including what the
+user edited since. Elements added by the user are kept in place. When the
+generated children of an element change from some point on (more cells,
+secondary date groups), the generated children from there are replaced.
+
+The functions work on lxml (inkex) element trees.
+"""
+
+import json
+
+ARGS_ATTRIBUTE = "data-multicalendar-args"
+# Arguments that do not change the generated calendar
+OPERATIONAL_ARGS = ("--output", "--id", "--selected-nodes", "--tab", "--update", "--instrument",
+                    "--profile", "--workers", "--fragment-cache", "--fragment-cache-dir",
+                    "--fragment-cache-size")
+# Arguments naming files of this machine, never taken from a document: the
+# previous calendar is rendered with the event feeds of the current run
+LOCAL_ARGS = ("--events",)
+
+
+def layout_args(args, ignored=OPERATIONAL_ARGS):
+    """The options of a command line that decide what is rendered"""
+    return [arg for arg in args if isinstance(arg, str) and arg.startswith("--") and
+            arg.split("=", 1)[0] not in ignored]
+
+
+def render_args(args):
+    """The options of a command line that decide what is rendered, as JSON"""
+    return json.dumps(layout_args(args))
+
+
+def stored_args(group):
+    """
+    The options stored by render_args on a generated group, or None. The
+    document may come from anyone, so they go through the same filter and
+    lose the local files.
+    """
+    value = group.get(ARGS_ATTRIBUTE)
+    if value is None:
+        return None
+    try:
+        args = json.loads(value)
+    except ValueError:
+        return None
+    if not isinstance(args, list):
+        return None
+    return layout_args(args, OPERATIONAL_ARGS + LOCAL_ARGS)
+
+
+def match(current, old):
+    """
+    The child of current matching each child of old, in order, skipping the
+    elements added by the user. None when some generated child is missing.
+    """
+    children = list(current)
+    matched = []
+    position = 0
+    for child in old:
+        while position < len(children) and children[position].tag != child.tag:
+            position += 1
+        if position == len(children):
+            return None
+        matched.append(children[position])
+        position += 1
+    return matched
+
+
+def patch(current, old, new):
+    """
+    Apply the differences between the generated trees old and new to current,
+    old being what was generated when current was created. Returns the number
+    of elements changed in current.
+    """
+    matched = match(current, old)
+    if matched is None or current.tag != new.tag:
+        if elements_equal(old, new):
+            return 0
+        current.getparent().replace(current, new)
+        return 1
+    changed = 0
+    # attrib, as inkex normalizes the values read with get()
+    for key in set(old.attrib) | set(new.attrib):
+        value = new.attrib.get(key)
+        if old.attrib.get(key) != value:
+            if value is None:
+                current.attrib.pop(key, None)
+            else:
+                current.attrib[key] = value
+            changed = 1
+    if old.text != new.text:
+        current.text = new.text
+        changed = 1
+    old_children, new_children = list(old), list(new)
+    # taken first, children replaced by the recursion keep their position
+    positions = [current.index(child) for child in matched]
+    common = 0
+    while common < min(len(old_children), len(new_children)) and \
+            old_children[common].tag == new_children[common].tag:
+        changed += patch(matched[common], old_children[common], new_children[common])
+        common += 1
+    if common < len(old_children) or common < len(new_children):
+        # different children from here on: swap the generated ones
+        if common < len(positions):
+            index = positions[common]
+        else:
+            index = positions[common - 1] + 1 if common else 0
+        for child in matched[common:]:
+            current.remove(child)
+        for offset, child in enumerate(new_children[common:]):
+            current.insert(index + offset, child)
+        changed += 1
+    return changed
+
+
+def elements_equal(first, second):
+    if first.tag != second.tag or dict(first.attrib) != dict(second.attrib) or \
+            first.text != second.text or len(first) != len(second):
+        return False
+    return all(elements_equal(a, b) for a, b in zip(first, second))
@@ -0,0 +1,63 @@
+"""
+Week numbers computed from the dates of a calendar row.
+
+A row is the 7 days starting at a JDN. Its number only depends on those days,
+so any month or range can be rendered on its own, in any order. The schemes
+are:
+
+    iso    ISO 8601: week 1 holds the first Thursday of the Gregorian year,
+           a row is numbered by its Thursday (for rows starting on Sunday
+           this is the "4 days or more" rule of the US epidemiological weeks)
+    us     week 1 holds January 1st, a row is numbered by its last day
+    hijri  week 1 holds 1 Muharram, a row is numbered by its last day
+
+The start of every year is computed once and cached.
+"""
+
+from functools import lru_cache
+
+from multicalendar_libs import convert
+
+SCHEMES = ("iso", "us", "hijri")
+
+
+def scheme_for(options):
+    """The scheme of the week_numbering option, "auto" picking the usual one"""
+    if options.week_numbering != "auto":
+        return options.week_numbering
+    if options.primary_calendar == "hijri":
+        return "hijri"
+    return "us" if options.start_day == 'sun' else "iso"
+
+
+@lru_cache(maxsize=64)
+def week_one(scheme, year, adjust=0):
+    """The JDN of the reference day of week 1 of year"""
+    if scheme == "hijri":
+        return convert.hijri_to_jdn(year, 1, 1, adjust)
+    jan1 = convert.gregorian_to_jdn(year, 1, 1)
+    if scheme == "iso":
+        # the first Thursday, JDN % 7 is 0 on Mondays
+        return jan1 + (3 - jan1 % 7) % 7
+    return jan1
+
+
+def week_number(scheme, row_start, adjust=0):
+    """The week number of the row of 7 days starting at JDN row_start"""
+    if scheme == "iso":
+        day = row_start + (3 - row_start % 7) % 7
+        year = convert.jdn_to_gregorian(day)[0]
+    elif scheme == "us":
+        day = row_start + 6
+        year = convert.jdn_to_gregorian(day)[0]
+    elif scheme == "hijri":
+        day = row_start + 6
+        year = convert.jdn_to_hijri(day, adjust)[0]
+        # the day conversion can disagree with the month starts by a day
+        if day < week_one(scheme, year, adjust):
+            year -= 1
+        elif day >= week_one(scheme, year + 1, adjust):
+            year += 1
+    else:
+        raise ValueError('Unknown week numbering "{0}".'.format(scheme))
+    return (day - week_one(scheme, year, adjust)) // 7 + 1
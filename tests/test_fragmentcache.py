@@ -0,0 +1,66 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from multicalendar_libs.fragmentcache import FragmentCache
+
+
+def key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class TrimTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *parts):
+        path = os.path.join(self.directory, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as other:
+            other.write("x" * 4096)
+        # older than any fragment, the first to go if it were counted
+        os.utime(path, (0, 0))
+        return path
+
+    def test_foreign_files_survive(self):
+        foreign = [
+            self.write("notes.txt"),
+            self.write("sub", "photo.raw"),
+            # a cache shaped name outside a prefix directory, or in another one
+            self.write(key("a") + ".svgf"),
+            self.write("zz", key("b") + ".svgf"),
+            self.write(key("c")[:2], key("d") + ".svgf"),
+            # a fragment being written by another run
+            self.write(key("e")[:2], "tmpabc123.tmp"),
+        ]
+        cache = FragmentCache(self.directory, max_bytes=0)
+        cache.put(key("f"), "<g/>")
+        cache.put(key("g"), "<g/>")
+        cache.trim()
+        self.assertIsNone(cache.get(key("f")))
+        self.assertIsNone(cache.get(key("g")))
+        for path in foreign:
+            self.assertTrue(os.path.exists(path), path)
+
+    def test_least_recently_used_first(self):
+        cache = FragmentCache(self.directory, max_bytes=0)
+        for name in "abc":
+            cache.put(key(name), "<g>{0}</g>".format(name))
+        os.utime(cache.path(key("a")), (1, 1))
+        os.utime(cache.path(key("b")), (3, 3))
+        os.utime(cache.path(key("c")), (2, 2))
+        cache.max_bytes = os.path.getsize(cache.path(key("b")))
+        cache.trim()
+        self.assertIsNone(cache.get(key("a")))
+        self.assertIsNone(cache.get(key("c")))
+        self.assertEqual(cache.get(key("b")), "<g>b</g>")
+
+
+if __name__ == '__main__':
+    unittest.main()
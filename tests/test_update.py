@@ -0,0 +1,85 @@
+import io
+import json
+import unittest
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+from multicalendar_libs import update
+from multicalendar_libs.headless import HeadlessCalendar
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def year_group(args):
+    """The calendar group generated by the headless generator for args, as lxml"""
+    calendar = HeadlessCalendar()
+    calendar.parse_arguments(args)
+    calendar.generate(calendar.document.getroot())
+    out = io.StringIO()
+    calendar.document.write(out)
+    root = etree.fromstring(out.getvalue().encode("utf-8"))
+    return next(element for element in root.iter()
+                if (element.get("id") or "").startswith("year_"))
+
+
+def by_id(group, id):
+    return next(element for element in group.iter() if element.get("id") == id)
+
+
+@unittest.skipIf(etree is None, "lxml is not installed")
+class PatchTest(unittest.TestCase):
+    OLD = ["--year=2024", "--show-week-number=true"]
+    NEW = OLD + ["--enable-secondary-date=true", "--color-day=#ff0000"]
+
+    def edited(self):
+        """The calendar of OLD with the edits of a user"""
+        current = year_group(self.OLD)
+        month = by_id(current, "month_3_2024")
+        day = month.findall(SVG + "g")[1].findall(SVG + "text")[4]
+        day.set("data-user", "mark")
+        etree.SubElement(month, SVG + "rect", width="3", height="3")
+        return current, day
+
+    def test_edits_survive_an_update(self):
+        current, day = self.edited()
+        document = etree.Element(SVG + "svg")
+        document.append(current)
+        changed = update.patch(current, year_group(self.OLD), year_group(self.NEW))
+        self.assertGreater(changed, 0)
+        current = document[0]
+        month = by_id(current, "month_3_2024")
+        self.assertEqual(day.get("data-user"), "mark")
+        self.assertIn(day, list(current.iter()))
+        self.assertEqual(len(month.findall(SVG + "rect")), 1)
+        # without the edits, the calendar is the one generated with NEW
+        del day.attrib["data-user"]
+        month.remove(month.find(SVG + "rect"))
+        self.assertTrue(update.elements_equal(current, year_group(self.NEW)))
+
+    def test_same_options_change_nothing(self):
+        current, day = self.edited()
+        before = etree.tostring(current)
+        self.assertEqual(update.patch(current, year_group(self.OLD), year_group(self.OLD)), 0)
+        self.assertEqual(etree.tostring(current), before)
+
+
+class StoredArgsTest(unittest.TestCase):
+
+    def test_operational_and_local_args_are_dropped(self):
+        stored = ["--year=2024", "--fragment-cache=true", "--fragment-cache-dir=/home",
+                  "--fragment-cache-size=0", "--workers=8", "--events=/etc/holidays.ics",
+                  "--profile=run.prof", 3]
+        group = {update.ARGS_ATTRIBUTE: json.dumps(stored)}
+        self.assertEqual(update.stored_args(group), ["--year=2024"])
+
+    def test_invalid_values(self):
+        self.assertIsNone(update.stored_args({}))
+        self.assertIsNone(update.stored_args({update.ARGS_ATTRIBUTE: "{"}))
+        self.assertIsNone(update.stored_args({update.ARGS_ATTRIBUTE: '{"a": 1}'}))
+
+
+if __name__ == '__main__':
+    unittest.main()